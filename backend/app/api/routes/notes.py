@@ -2,39 +2,64 @@ from fastapi import APIRouter, HTTPException, BackgroundTasks
 from app.models.schemas import NoteGenerationResponse, NoteResponse
 from app.core.rag import RAGEngine
 from app.core.database import get_supabase
+from app.core.config import get_settings
+from app.core import jobs
+from app.services.checkpoints import CheckpointStore
+from app.services.page_cache import enforce_storage_budget
 from uuid import UUID
+import asyncio
 import time
 
 router = APIRouter(prefix="/api/notes", tags=["notes"])
+settings = get_settings()
 
 @router.post("/generate/{doc_id}", response_model=NoteGenerationResponse)
-async def generate_notes(doc_id: UUID, background_tasks: BackgroundTasks):
+async def generate_notes(doc_id: UUID, background_tasks: BackgroundTasks, batch: bool = False):
     """
-    Trigger note generation for a processed document
+    Trigger note generation for a processed document.
+
+    With `?batch=true`, section notes go through the Message Batches API:
+    half price, but results can take up to 24h. Meant for bulk,
+    non-interactive regeneration; the default is real-time calls.
     """
     supabase = get_supabase()
 
-    # Check if document is ready
+    # Check if document exists
     doc_result = supabase.table("documents")\
-        .select("*")\
+        .select("id")\
         .eq("id", str(doc_id))\
         .execute()
 
     if not doc_result.data:
         raise HTTPException(status_code=404, detail="Document not found")
 
-    doc = doc_result.data[0]
+    # Another request in this process already started generation: attach to it
+    if jobs.is_running(str(doc_id)):
+        return _attached_response(doc_id)
+
+    # Claim the document (ready -> generating) in a single conditional update,
+    # so only one request across all workers starts the pipeline
+    claim_id = jobs.claim_document(
+        str(doc_id),
+        "ready",
+        "generating",
+        lease_seconds=settings.generation_lease_seconds
+    )
+    if not claim_id:
+        doc = supabase.table("documents")\
+            .select("status")\
+            .eq("id", str(doc_id))\
+            .execute().data[0]
+
+        if doc["status"] == "generating":
+            return _attached_response(doc_id)
 
-    if doc["status"] != "ready":
         raise HTTPException(
             status_code=400,
             detail=f"Document not ready. Current status: {doc['status']}"
         )
 
-    # Update status to generating
-    supabase.table("documents").update({
-        "status": "generating"
-    }).eq("id", str(doc_id)).execute()
+    jobs.mark_running(str(doc_id))
 
     supabase.table("job_status").update({
         "status": "generating",
@@ -44,8 +69,11 @@ async def generate_notes(doc_id: UUID, background_tasks: BackgroundTasks):
 
     # Trigger background generation
     background_tasks.add_task(
+        jobs.run_with_lease,
+        str(doc_id),
+        claim_id,
         generate_notes_pipeline,
-        str(doc_id)
+        batch=batch
     )
 
     return NoteGenerationResponse(
@@ -54,6 +82,13 @@ async def generate_notes(doc_id: UUID, background_tasks: BackgroundTasks):
         message="Note generation started"
     )
 
+def _attached_response(doc_id: UUID) -> NoteGenerationResponse:
+    return NoteGenerationResponse(
+        doc_id=doc_id,
+        status="generating",
+        message="Note generation already in progress"
+    )
+
 @router.get("/{doc_id}", response_model=NoteResponse)
 async def get_notes(doc_id: UUID):
     """
@@ -77,15 +112,20 @@ async def get_notes(doc_id: UUID):
         generated_at=note["generated_at"]
     )
 
-async def generate_notes_pipeline(doc_id: str):
+async def generate_notes_pipeline(doc_id: str, claim_id: str, batch: bool = False):
     """
-    Background task for note generation
+    Background task for note generation. Results are only saved while
+    `claim_id` still holds the document, so a worker whose lease was
+    taken over can't write notes alongside its successor. `batch`
+    generates section notes through the Message Batches API.
     """
     supabase = get_supabase()
     start_time = time.time()
+    checkpoint = CheckpointStore(doc_id)
 
     try:
-        rag_engine = RAGEngine()
+        # Batch mode trades latency (up to 24h) for half-price generation
+        rag_engine = RAGEngine(batch_mode=batch)
 
         # Update progress
         supabase.table("job_status").update({
@@ -99,7 +139,12 @@ async def generate_notes_pipeline(doc_id: str):
             "current_stage": "Generating comprehensive notes..."
         }).eq("doc_id", doc_id).execute()
 
-        notes = rag_engine.generate_comprehensive_notes(doc_id)
+        # Run off the event loop so lease renewal and other requests keep going
+        notes = await asyncio.to_thread(
+            rag_engine.generate_comprehensive_notes,
+            doc_id,
+            checkpoint=checkpoint
+        )
 
         # Save to database
         supabase.table("job_status").update({
@@ -109,6 +154,10 @@ async def generate_notes_pipeline(doc_id: str):
 
         generation_time = int(time.time() - start_time)
 
+        # Fresh lease first: a takeover can't happen before the status write below
+        if not jobs.renew_lease(doc_id, claim_id):
+            return
+
         supabase.table("notes").insert({
             "doc_id": doc_id,
             "title": notes["title"],
@@ -117,9 +166,8 @@ async def generate_notes_pipeline(doc_id: str):
         }).execute()
 
         # Update document status
-        supabase.table("documents").update({
-            "status": "completed"
-        }).eq("id", doc_id).execute()
+        if not jobs.release(doc_id, claim_id, {"status": "completed"}):
+            return
 
         supabase.table("job_status").update({
             "status": "completed",
@@ -127,12 +175,14 @@ async def generate_notes_pipeline(doc_id: str):
             "current_stage": "Notes generated successfully!"
         }).eq("doc_id", doc_id).execute()
 
+        checkpoint.clear()
+        # New section notes count toward the storage budget
+        await asyncio.to_thread(enforce_storage_budget)
+
     except Exception as e:
         error_msg = str(e)
-        supabase.table("documents").update({
-            "status": "failed",
-            "error_message": error_msg
-        }).eq("id", doc_id).execute()
+        if not jobs.release(doc_id, claim_id, {"status": "failed", "error_message": error_msg}):
+            return
 
         # Truncate error for job_status (max 100 chars)
         short_error = error_msg[:97] + "..." if len(error_msg) > 100 else error_msg
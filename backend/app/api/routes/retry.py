@@ -0,0 +1,118 @@
+# route for resuming a failed pipeline from its checkpoints
+from fastapi import APIRouter, HTTPException, BackgroundTasks
+from app.models.schemas import RetryResponse
+from app.services.processing_pipeline import process_pdf_pipeline
+from app.services.checkpoints import CheckpointStore
+from app.services.page_cache import PageTextCache
+from app.api.routes.notes import generate_notes_pipeline
+from app.core.database import get_supabase
+from app.core.config import get_settings
+from app.core import jobs
+from uuid import UUID
+from pathlib import Path
+from typing import Optional
+
+router = APIRouter(prefix="/api", tags=["retry"])
+settings = get_settings()
+
+# Statuses a document is left in when its worker dies mid-pipeline
+IN_PROGRESS = ("uploaded", "processing", "generating")
+
+@router.post("/retry/{doc_id}", response_model=RetryResponse)
+async def retry_document(doc_id: UUID, background_tasks: BackgroundTasks):
+    """
+    Resume a failed document from its last completed checkpoint.
+    A document left mid-pipeline by a dead worker can be retried once
+    its lease has expired.
+    """
+    supabase = get_supabase()
+
+    doc_result = supabase.table("documents")\
+        .select("*")\
+        .eq("id", str(doc_id))\
+        .execute()
+
+    if not doc_result.data:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    doc = doc_result.data[0]
+
+    checkpoint = CheckpointStore(str(doc_id))
+
+    # Ingest finished (vectors are in Pinecone) -> the failure was in note generation
+    if checkpoint.is_ingested() or doc.get("total_chunks"):
+        claim_id = _claim_for_retry(str(doc_id), "generating")
+        if not claim_id:
+            raise _not_retryable(doc_id)
+
+        jobs.mark_running(str(doc_id))
+
+        supabase.table("documents").update({
+            "error_message": None
+        }).eq("id", str(doc_id)).execute()
+
+        supabase.table("job_status").update({
+            "status": "generating",
+            "progress": 0,
+            "current_stage": "Resuming note generation..."
+        }).eq("doc_id", str(doc_id)).execute()
+
+        background_tasks.add_task(jobs.run_with_lease, str(doc_id), claim_id, generate_notes_pipeline)
+
+        return RetryResponse(
+            doc_id=doc_id,
+            status="generating",
+            message="Note generation resumed"
+        )
+
+    file_path = Path(settings.upload_dir) / f"{doc_id}.pdf"
+    # An evicted PDF can still be re-processed from its cached page text,
+    # if that was extracted in the mode ingest will ask for
+    mode = "layout" if settings.layout_extraction else "text"
+    if not file_path.exists() and not PageTextCache().has(str(file_path), mode):
+        raise HTTPException(status_code=410, detail="Original PDF is no longer available")
+
+    claim_id = _claim_for_retry(str(doc_id), "processing")
+    if not claim_id:
+        raise _not_retryable(doc_id)
+
+    jobs.mark_running(str(doc_id))
+
+    supabase.table("documents").update({
+        "error_message": None
+    }).eq("id", str(doc_id)).execute()
+
+    supabase.table("job_status").update({
+        "status": "processing",
+        "progress": 0,
+        "current_stage": "Resuming processing..."
+    }).eq("doc_id", str(doc_id)).execute()
+
+    background_tasks.add_task(jobs.run_with_lease, str(doc_id), claim_id, process_pdf_pipeline, str(file_path))
+
+    return RetryResponse(
+        doc_id=doc_id,
+        status="processing",
+        message="Processing resumed"
+    )
+
+def _claim_for_retry(doc_id: str, to_status: str) -> Optional[str]:
+    if jobs.is_running(doc_id):
+        return None
+    claim_id = jobs.claim_document(doc_id, "failed", to_status)
+    for status in IN_PROGRESS:
+        if claim_id:
+            break
+        claim_id = jobs.claim_stale(doc_id, status, to_status, settings.generation_lease_seconds)
+    return claim_id
+
+def _not_retryable(doc_id: UUID) -> HTTPException:
+    doc = get_supabase().table("documents")\
+        .select("status")\
+        .eq("id", str(doc_id))\
+        .execute().data[0]
+
+    return HTTPException(
+        status_code=400,
+        detail=f"Only failed or stalled documents can be retried. Current status: {doc['status']}"
+    )
@@ -2,8 +2,11 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks
 from app.models.schemas import UploadResponse
 from app.services.processing_pipeline import process_pdf_pipeline
+from app.services.page_cache import enforce_storage_budget
 from app.core.database import get_supabase
 from app.core.config import get_settings
+from app.core import jobs
+import asyncio
 import os
 import uuid
 from pathlib import Path
@@ -41,6 +44,10 @@ async def upload_pdf(
     with open(file_path, "wb") as f:
         f.write(contents)
 
+    # Keep uploads and derived page text within the disk budget. The scan
+    # stats every cached file, so it runs off the event loop
+    await asyncio.to_thread(enforce_storage_budget, protect={file_path})
+
     # Create database record
     supabase = get_supabase()
 
@@ -60,9 +67,15 @@ async def upload_pdf(
         "current_stage": "File uploaded, ready for processing"
     }).execute()
 
+    # Hold a lease while ingesting, so a retry can take over if this worker dies
+    claim_id = jobs.claim_document(str(doc_id), "uploaded", "processing")
+    jobs.mark_running(str(doc_id))
+
     background_tasks.add_task(
-        process_pdf_pipeline,
+        jobs.run_with_lease,
         str(doc_id),
+        claim_id,
+        process_pdf_pipeline,
         str(file_path)
     )
 
@@ -16,6 +16,12 @@ class Settings(BaseSettings):
     # App Settings
     max_file_size_mb: int = 50
     upload_dir: str = "./uploads"
+    checkpoint_dir: str = "./checkpoints"
+    page_cache_dir: str = "./page_cache"
+    section_cache_dir: str = "./section_cache"
+    storage_budget_mb: int = 2048
+    layout_extraction: bool = False
+    generation_lease_seconds: int = 600
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,130 @@
+from app.core.database import get_supabase
+from app.core.config import get_settings
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+import asyncio
+import uuid
+
+settings = get_settings()
+
+# doc_ids with a background job running in this process
+_running: Set[str] = set()
+
+# Lease renewals get their own threads: long jobs run in the event loop's
+# default executor, and a renewal queued behind them would let the lease
+# expire while the job is still alive
+_heartbeat_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="lease-heartbeat")
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+def claim_document(doc_id: str, from_status: str, to_status: str, lease_seconds: int = None) -> Optional[str]:
+    """
+    Atomically move a document from `from_status` to `to_status`.
+
+    The status check and the write are a single conditional UPDATE, so
+    across all workers only one caller can win a claim. With
+    `lease_seconds`, a document left in `to_status` whose lease has not
+    been renewed for that long (its worker died) can be claimed again.
+
+    Returns the new claim id, or None if the claim was lost. The claim id
+    is stored on the document; only its holder can renew the lease or
+    write the job's result (see renew_lease and release).
+    """
+    claim_id = str(uuid.uuid4())
+
+    result = get_supabase().table("documents").update({
+        "status": to_status,
+        "claim_id": claim_id,
+        "updated_at": _now()
+    }).eq("id", doc_id).eq("status", from_status).execute()
+
+    if result.data:
+        return claim_id
+
+    if lease_seconds is None:
+        return None
+
+    return claim_stale(doc_id, to_status, to_status, lease_seconds)
+
+def claim_stale(doc_id: str, from_status: str, to_status: str, lease_seconds: int) -> Optional[str]:
+    """
+    Atomically take over a document stuck in `from_status` whose lease
+    has not been renewed for `lease_seconds`, moving it to `to_status`.
+    Returns the new claim id, or None.
+    """
+    claim_id = str(uuid.uuid4())
+    cutoff = (datetime.now(timezone.utc) - timedelta(seconds=lease_seconds)).isoformat()
+
+    result = get_supabase().table("documents").update({
+        "status": to_status,
+        "claim_id": claim_id,
+        "updated_at": _now()
+    }).eq("id", doc_id).eq("status", from_status).lt("updated_at", cutoff).execute()
+
+    return claim_id if result.data else None
+
+def renew_lease(doc_id: str, claim_id: str) -> bool:
+    """Extend the lease; False once another worker has taken the document over"""
+    result = get_supabase().table("documents").update({
+        "updated_at": _now()
+    }).eq("id", doc_id).eq("claim_id", claim_id).execute()
+
+    return bool(result.data)
+
+def release(doc_id: str, claim_id: str, fields: Dict) -> bool:
+    """
+    Write a job's final document fields (status etc.) and end the claim,
+    only if `claim_id` still holds the document
+    """
+    result = get_supabase().table("documents").update({
+        **fields,
+        "claim_id": None,
+        "updated_at": _now()
+    }).eq("id", doc_id).eq("claim_id", claim_id).execute()
+
+    return bool(result.data)
+
+def is_running(doc_id: str) -> bool:
+    """Whether this process is already running a job for the document"""
+    return doc_id in _running
+
+def mark_running(doc_id: str):
+    """Register a claimed job before its background task starts"""
+    _running.add(doc_id)
+
+async def run_with_lease(
+    doc_id: str,
+    claim_id: str,
+    job: Callable[..., Awaitable],
+    *args: Any,
+    lease_seconds: int = None,
+    **kwargs: Any
+):
+    """
+    Run a claimed job as job(doc_id, *args, claim_id=claim_id, **kwargs),
+    renewing the document's lease until it finishes
+    """
+    lease_seconds = lease_seconds or settings.generation_lease_seconds
+    heartbeat = asyncio.create_task(_renew_lease(doc_id, claim_id, lease_seconds))
+
+    try:
+        await job(doc_id, *args, claim_id=claim_id, **kwargs)
+    finally:
+        heartbeat.cancel()
+        _running.discard(doc_id)
+
+async def _renew_lease(doc_id: str, claim_id: str, lease_seconds: int):
+    while True:
+        await asyncio.sleep(lease_seconds / 3)
+        try:
+            renewed = await asyncio.get_running_loop().run_in_executor(
+                _heartbeat_executor, renew_lease, doc_id, claim_id
+            )
+            if not renewed:
+                # Taken over or released; the job's final writes will be rejected
+                return
+        except Exception:
+            # A missed renewal is retried on the next tick
+            pass
@@ -1,6 +1,9 @@
 from app.services.pinecone_client import PineconeClient
 from app.services.claude_client import ClaudeClient
-from typing import List, Dict
+from app.services.checkpoints import CheckpointStore
+from app.services.section_store import SectionNotesStore
+from typing import List, Dict, Optional, Tuple
+import hashlib
 import json
 
 SYSTEM_PROMPT = """You are an expert educational content creator specializing in CONCISE, exam-ready study notes.
@@ -62,13 +65,27 @@ WHAT TO SKIP:
 TONE: Clear, direct, student-friendly. Write like you're creating a premium study guide, not transcribing a textbook."""
 
 class RAGEngine:
-    def __init__(self):
-        self.pinecone_client = PineconeClient()
-        self.claude_client = ClaudeClient()
-
-    def generate_comprehensive_notes(self, doc_id: str) -> Dict:
+    def __init__(
+        self,
+        batch_mode: bool = False,
+        batch_poll_interval: float = 30.0,
+        section_store: SectionNotesStore = None,
+        claude_client: ClaudeClient = None,
+        pinecone_client: PineconeClient = None
+    ):
+        self.pinecone_client = pinecone_client or PineconeClient()
+        self.claude_client = claude_client or ClaudeClient()
+        # Notes of unchanged sections are reused across documents/versions
+        self.section_store = section_store or SectionNotesStore()
+        # Offline mode: submit every section as one Message Batch instead of
+        # calling Claude per section (half price, results within 24h)
+        self.batch_mode = batch_mode
+        self.batch_poll_interval = batch_poll_interval
+
+    def generate_comprehensive_notes(self, doc_id: str, checkpoint: Optional[CheckpointStore] = None) -> Dict:
         """
-        Generate comprehensive notes using Map-Reduce pattern
+        Generate comprehensive notes using Map-Reduce pattern.
+        Completed sections are saved to / reused from `checkpoint` if given.
         """
         # Step 1: Retrieve all chunks
         chunks = self.pinecone_client.fetch_all(doc_id)
@@ -83,16 +100,79 @@ class RAGEngine:
         sections = self._group_by_section(chunks)
 
         # Step 3: MAP - Generate notes for each section
-        section_notes = []
-        for section_name, section_chunks in sections.items():
-            notes = self._generate_section_notes(section_name, section_chunks)
-            section_notes.append(notes)
+        section_notes = self._map_sections(sections, checkpoint)
 
         # Step 4: REDUCE - Combine into final structure
         final_notes = self._combine_sections(section_notes, chunks[0].get("heading", "Lecture Notes"))
 
         return final_notes
 
+    def _map_sections(self, sections: Dict[str, List[Dict]], checkpoint: Optional[CheckpointStore]) -> List[Dict]:
+        """
+        Generate notes for every section not already in the checkpoint or,
+        by content fingerprint, in the section store
+        """
+        section_names = list(sections.keys())
+        fingerprints = [self._fingerprint_section(name, sections[name]) for name in section_names]
+        section_notes = [None] * len(section_names)
+        pending = []
+
+        for i, name in enumerate(section_names):
+            cached = checkpoint.load_section(i, name) if checkpoint else None
+            if cached is None:
+                cached = self.section_store.get(fingerprints[i])
+            if cached is not None:
+                section_notes[i] = cached
+            else:
+                pending.append(i)
+
+        if self.batch_mode and pending:
+            generated = self._generate_section_notes_batch({
+                i: (section_names[i], sections[section_names[i]]) for i in pending
+            }, checkpoint)
+        else:
+            generated = None
+
+        for i in pending:
+            name = section_names[i]
+            if generated is not None:
+                notes = generated.get(i)
+            else:
+                notes = self._generate_section_notes(name, sections[name])
+
+            if notes is None:
+                # Failed sections are not stored so a resume retries them
+                notes = self._fallback_section_notes(name)
+            else:
+                self.section_store.put(fingerprints[i], notes)
+                if checkpoint:
+                    checkpoint.save_section(i, name, notes)
+
+            section_notes[i] = notes
+
+        if generated is not None and checkpoint:
+            # Its results are saved above, so a resume must not reuse the batch
+            checkpoint.clear_batch()
+
+        return section_notes
+
+    def _fingerprint_section(self, section_name: str, chunks: List[Dict]) -> str:
+        """
+        Content hash of a section: its name and chunk texts (both go into
+        the prompt) plus the model and system prompt that notes would be
+        generated with. Page numbers are left out so slides shifting
+        position don't invalidate notes.
+        """
+        digest = hashlib.sha256()
+        digest.update(self.claude_client.model.encode("utf-8"))
+        digest.update(SYSTEM_PROMPT.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(section_name.encode("utf-8"))
+        for chunk in chunks:
+            digest.update(b"\0")
+            digest.update(chunk["text"].encode("utf-8"))
+        return digest.hexdigest()
+
     def _group_by_section(self, chunks: List[Dict]) -> Dict[str, List[Dict]]:
         """
         Group chunks by section (heading or page ranges)
@@ -128,9 +208,9 @@ class RAGEngine:
 
         return sections
 
-    def _generate_section_notes(self, section_name: str, chunks: List[Dict]) -> Dict:
+    def _build_section_prompt(self, section_name: str, chunks: List[Dict]) -> str:
         """
-        Generate notes for a single section using Claude
+        Build the user prompt for a single section
         """
         # Combine chunk texts
         context = "\n\n".join([
@@ -138,7 +218,7 @@ class RAGEngine:
             for chunk in chunks
         ])
 
-        user_prompt = f"""Generate CONCISE, exam-focused notes for this section.
+        return f"""Generate CONCISE, exam-focused notes for this section.
 
 SECTION: {section_name}
 
@@ -152,17 +232,75 @@ Remember:
 - Focus on exam-relevant information
 - Return valid JSON only (no markdown, no code blocks)"""
 
+    def _fallback_section_notes(self, section_name: str) -> Dict:
+        """
+        Fallback structure if generation or parsing fails
+        """
+        return {
+            "heading": section_name,
+            "introduction": "Error processing section",
+            "subsections": [],
+            "keyTerms": []
+        }
+
+    def _generate_section_notes(self, section_name: str, chunks: List[Dict]) -> Optional[Dict]:
+        """
+        Generate notes for a single section using Claude (None on failure)
+        """
+        user_prompt = self._build_section_prompt(section_name, chunks)
+
         try:
-            notes = self.claude_client.generate_structured(SYSTEM_PROMPT, user_prompt)
+            # SYSTEM_PROMPT is shared by every MAP call, so it is marked for
+            # caching. At ~450 tokens it is below the model's minimum
+            # cacheable prompt (1024 tokens), so today the API ignores the
+            # marker; it takes effect only if the prompt grows past that.
+            notes = self.claude_client.generate_structured(SYSTEM_PROMPT, user_prompt, cache_system=True)
             return notes
         except Exception as e:
-            # Fallback structure if parsing fails
-            return {
-                "heading": section_name,
-                "introduction": "Error processing section",
-                "subsections": [],
-                "keyTerms": []
-            }
+            return None
+
+    def _generate_section_notes_batch(
+        self,
+        sections: Dict[int, Tuple[str, List[Dict]]],
+        checkpoint: Optional[CheckpointStore] = None
+    ) -> Dict[int, Optional[Dict]]:
+        """
+        Generate notes for the given sections ({index: (name, chunks)})
+        in a single Message Batch.
+
+        The batch id is saved to `checkpoint`, so a run resumed after a
+        restart or lease takeover waits for the batch already submitted
+        instead of paying for a new one.
+        """
+        covered = {f"section-{i}": name for i, (name, _) in sections.items()}
+        saved = checkpoint.load_batch() if checkpoint else None
+
+        if saved is not None and all(saved["sections"].get(key) == name for key, name in covered.items()):
+            batch_id = saved["id"]
+        else:
+            batch_id = self.claude_client.submit_batch({
+                f"section-{i}": self.claude_client.build_params(
+                    SYSTEM_PROMPT,
+                    self._build_section_prompt(name, section_chunks),
+                    max_tokens=4000,
+                    cache_system=True
+                )
+                for i, (name, section_chunks) in sections.items()
+            })
+            if checkpoint:
+                checkpoint.save_batch(batch_id, covered)
+
+        results = self.claude_client.wait_for_batch(batch_id, poll_interval=self.batch_poll_interval)
+
+        section_notes = {}
+        for i in sections:
+            try:
+                section_notes[i] = self.claude_client.parse_json(results[f"section-{i}"])
+            except Exception:
+                # Missing (errored/expired) or unparsable result
+                section_notes[i] = None
+
+        return section_notes
 
     def _combine_sections(self, section_notes: List[Dict], title: str) -> Dict:
         """
@@ -1,7 +1,7 @@
 import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.routes import upload, status, notes
+from app.api.routes import upload, status, notes, retry
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -23,6 +23,7 @@ app.add_middleware(
 app.include_router(upload.router)
 app.include_router(status.router)
 app.include_router(notes.router)
+app.include_router(retry.router)
 
 @app.get("/")
 async def root():
@@ -31,6 +31,11 @@ class NoteGenerationResponse(BaseModel):
     status: str
     message: str
 
+class RetryResponse(BaseModel):
+    doc_id: UUID
+    status: str
+    message: str
+
 class NoteResponse(BaseModel):
     doc_id: UUID
     notes: Dict[str, Any]
@@ -0,0 +1,187 @@
+from app.core.config import get_settings
+from pathlib import Path
+from typing import List, Dict, Optional, Iterable, Iterator, Set, Tuple
+from array import array
+import base64
+import json
+import os
+import shutil
+
+settings = get_settings()
+
+class CheckpointStore:
+    """
+    Local, per-document checkpoints so a restarted pipeline can continue
+    from the last completed unit instead of starting over.
+
+    Layout under <checkpoint_dir>/<doc_id>/:
+        chunks.jsonl        extracted chunks, appended page by page
+        extracted           marker: chunks.jsonl is complete
+        embeddings.jsonl    {"chunk_id", "embedding": base64 float32} per line,
+                            appended per batch, in chunk order
+        upserted.txt        one chunk_id per line, appended per upserted batch
+        ingested            marker: vectors are all in Pinecone
+        sections/<i>.json   completed section notes
+        batch.json          in-flight Message Batch: its id and the
+                            {custom_id: section name} it covers
+    """
+
+    def __init__(self, doc_id: str, base_dir: str = None):
+        self.doc_id = doc_id
+        self.root = Path(base_dir or settings.checkpoint_dir) / doc_id
+
+    def _path(self, name: str) -> Path:
+        return self.root / name
+
+    def _write_atomic(self, path: Path, data: str):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _append_lines(self, name: str, lines: Iterable[str]):
+        path = self._path(name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._drop_partial_line(path)
+        with open(path, "a", encoding="utf-8") as f:
+            for line in lines:
+                f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _drop_partial_line(self, path: Path):
+        """
+        Truncate a partial last line left by a crash mid-append, so new
+        lines don't get glued onto it and the log stays in order
+        """
+        if not path.exists():
+            return
+        with open(path, "rb+") as f:
+            end = f.seek(0, os.SEEK_END)
+            if end == 0:
+                return
+            f.seek(end - 1)
+            if f.read(1) == b"\n":
+                return
+
+            pos = end
+            while pos > 0:
+                start = max(pos - 4096, 0)
+                f.seek(start)
+                newline = f.read(pos - start).rfind(b"\n")
+                if newline != -1:
+                    f.truncate(start + newline + 1)
+                    return
+                pos = start
+            f.truncate(0)
+
+    def _read_lines(self, name: str) -> Iterable[str]:
+        path = self._path(name)
+        if not path.exists():
+            return
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                # A crash mid-append can leave a partial last line
+                if line.endswith("\n"):
+                    yield line[:-1]
+
+    # Extraction
+
+    def has_chunks(self) -> bool:
+        return self._path("extracted").exists()
+
+    def iter_chunks(self) -> Iterator[Dict]:
+        for line in self._read_lines("chunks.jsonl"):
+            yield json.loads(line)
+
+    def begin_chunks(self):
+        """Start a fresh extraction (drops any partial chunk log)"""
+        self._path("extracted").unlink(missing_ok=True)
+        self._path("chunks.jsonl").unlink(missing_ok=True)
+
+    def append_chunks(self, chunks: List[Dict]):
+        self._append_lines("chunks.jsonl", (json.dumps(chunk) for chunk in chunks))
+
+    def finish_chunks(self):
+        self._write_atomic(self._path("extracted"), "")
+
+    # Embedding
+
+    def iter_embeddings(self, skip: Set[str] = frozenset()) -> Iterator[Tuple[str, array]]:
+        """
+        Yield saved (chunk_id, embedding) pairs in chunk order, except for
+        chunk ids in `skip`. Read lazily, one line at a time.
+        """
+        for line in self._read_lines("embeddings.jsonl"):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record["chunk_id"] in skip:
+                continue
+            yield record["chunk_id"], array("f", base64.b64decode(record["embedding"]))
+
+    def append_embeddings(self, embeddings: Dict[str, array]):
+        self._append_lines("embeddings.jsonl", (
+            json.dumps({
+                "chunk_id": chunk_id,
+                "embedding": base64.b64encode(embedding.tobytes()).decode("ascii")
+            })
+            for chunk_id, embedding in embeddings.items()
+        ))
+
+    # Upsert
+
+    def load_upserted(self) -> Set[str]:
+        return set(self._read_lines("upserted.txt"))
+
+    def mark_upserted(self, chunk_ids: Iterable[str]):
+        self._append_lines("upserted.txt", chunk_ids)
+
+    def mark_ingested(self):
+        """
+        Record that ingest finished and drop the now unneeded ingest data
+        """
+        self._write_atomic(self._path("ingested"), "")
+        for name in ("chunks.jsonl", "extracted", "embeddings.jsonl", "upserted.txt"):
+            self._path(name).unlink(missing_ok=True)
+
+    def is_ingested(self) -> bool:
+        return self._path("ingested").exists()
+
+    # Note generation
+
+    def load_section(self, index: int, section_name: str) -> Optional[Dict]:
+        path = self._path(f"sections/{index}.json")
+        if not path.exists():
+            return None
+        with open(path, encoding="utf-8") as f:
+            record = json.load(f)
+        # Only reuse it if sectioning still lines up
+        if record.get("section") != section_name:
+            return None
+        return record["notes"]
+
+    def save_section(self, index: int, section_name: str, notes: Dict):
+        self._write_atomic(
+            self._path(f"sections/{index}.json"),
+            json.dumps({"section": section_name, "notes": notes})
+        )
+
+    def load_batch(self) -> Optional[Dict]:
+        path = self._path("batch.json")
+        if not path.exists():
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def save_batch(self, batch_id: str, sections: Dict[str, str]):
+        self._write_atomic(self._path("batch.json"), json.dumps({"id": batch_id, "sections": sections}))
+
+    def clear_batch(self):
+        self._path("batch.json").unlink(missing_ok=True)
+
+    def clear(self):
+        """Remove all checkpoints for this document"""
+        shutil.rmtree(self.root, ignore_errors=True)
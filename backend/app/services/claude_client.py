@@ -1,36 +1,61 @@
 from anthropic import Anthropic
 from app.core.config import get_settings
+from typing import Dict, List
 import json
+import time
 
 settings = get_settings()
 
 class ClaudeClient:
-    def __init__(self):
-        self.client = Anthropic(api_key=settings.anthropic_api_key)
+    def __init__(self, client=None):
+        # `client` lets callers pass a stand-in exposing the same
+        # messages / messages.batches surface as the Anthropic SDK
+        self.client = client or Anthropic(api_key=settings.anthropic_api_key)
         self.model = "claude-sonnet-4-5-20250929"
 
-    def generate(self, system: str, user: str, max_tokens: int = 4000) -> str:
+    def _system_blocks(self, system: str, cache: bool) -> List[Dict]:
         """
-        Generate text using Claude
+        Wrap the system prompt in a text block, marked for prompt caching
         """
-        response = self.client.messages.create(
-            model=self.model,
-            max_tokens=max_tokens,
-            system=system,
-            messages=[
+        block = {"type": "text", "text": system}
+        if cache:
+            block["cache_control"] = {"type": "ephemeral"}
+        return [block]
+
+    def build_params(self, system: str, user: str, max_tokens: int = 4000, cache_system: bool = False) -> Dict:
+        """
+        Build the Messages API parameters for a single request
+        """
+        return {
+            "model": self.model,
+            "max_tokens": max_tokens,
+            "system": self._system_blocks(system, cache_system),
+            "messages": [
                 {"role": "user", "content": user}
             ]
+        }
+
+    def generate(self, system: str, user: str, max_tokens: int = 4000, cache_system: bool = False) -> str:
+        """
+        Generate text using Claude
+        """
+        response = self.client.messages.create(
+            **self.build_params(system, user, max_tokens, cache_system)
         )
 
         return response.content[0].text
 
-    def generate_structured(self, system: str, user: str) -> dict:
+    def generate_structured(self, system: str, user: str, cache_system: bool = False) -> dict:
         """
         Generate and parse JSON response
         """
-        response_text = self.generate(system, user, max_tokens=4000)
+        response_text = self.generate(system, user, max_tokens=4000, cache_system=cache_system)
+        return self.parse_json(response_text)
 
-        # Extract JSON from response (handle code blocks)
+    def parse_json(self, response_text: str) -> dict:
+        """
+        Extract JSON from response (handle code blocks)
+        """
         if "```json" in response_text:
             json_str = response_text.split("```json")[1].split("```")[0].strip()
         elif "```" in response_text:
@@ -38,4 +63,47 @@ class ClaudeClient:
         else:
             json_str = response_text.strip()
 
-        return json.loads(json_str)
\ No newline at end of file
+        return json.loads(json_str)
+
+    def run_batch(self, requests: Dict[str, Dict], poll_interval: float = 30.0, timeout: float = 24 * 3600) -> Dict[str, str]:
+        """
+        Submit requests ({custom_id: params}) as one Message Batch, wait for it
+        to end and return {custom_id: text} for the requests that succeeded
+        """
+        batch_id = self.submit_batch(requests)
+        return self.wait_for_batch(batch_id, poll_interval, timeout)
+
+    def submit_batch(self, requests: Dict[str, Dict]) -> str:
+        """
+        Submit requests ({custom_id: params}) as one Message Batch and
+        return its id
+        """
+        batch = self.client.messages.batches.create(
+            requests=[
+                {"custom_id": custom_id, "params": params}
+                for custom_id, params in requests.items()
+            ]
+        )
+        return batch.id
+
+    def wait_for_batch(self, batch_id: str, poll_interval: float = 30.0, timeout: float = 24 * 3600) -> Dict[str, str]:
+        """
+        Wait for a submitted batch to end (cancelling it after `timeout`)
+        and return {custom_id: text} for the requests that succeeded
+        """
+        batch = self.client.messages.batches.retrieve(batch_id)
+
+        deadline = time.time() + timeout
+        while batch.processing_status != "ended":
+            if time.time() > deadline:
+                self.client.messages.batches.cancel(batch.id)
+                raise TimeoutError(f"Message batch {batch.id} did not finish in {timeout}s")
+            time.sleep(poll_interval)
+            batch = self.client.messages.batches.retrieve(batch.id)
+
+        results = {}
+        for entry in self.client.messages.batches.results(batch.id):
+            if entry.result.type == "succeeded":
+                results[entry.custom_id] = entry.result.message.content[0].text
+
+        return results
@@ -1,6 +1,8 @@
 from openai import OpenAI
 from app.core.config import get_settings
 from typing import List
+from array import array
+import base64
 
 settings = get_settings()
 
@@ -27,4 +29,17 @@ class EmbeddingService:
             model=self.model,
             input=texts
         )
-        return [item.embedding for item in response.data]
\ No newline at end of file
+        return [item.embedding for item in response.data]
+
+    def embed_batch_f32(self, texts: List[str]) -> List[array]:
+        """
+        Generate embeddings for multiple texts as compact float32 arrays
+        """
+        # base64 transfers raw little-endian float32s, skipping the
+        # per-value Python float objects of the default encoding
+        response = self.client.embeddings.create(
+            model=self.model,
+            input=texts,
+            encoding_format="base64"
+        )
+        return [array("f", base64.b64decode(item.embedding)) for item in response.data]
@@ -0,0 +1,119 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+import re
+
+# A line counts as a heading when its font is this much larger than body text
+HEADING_SIZE_RATIO = 1.15
+MAX_HEADING_LEVELS = 3
+MAX_HEADING_CHARS = 100
+# Header/footer bands, as a fraction of page height
+TOP_MARGIN = 0.08
+BOTTOM_MARGIN = 0.92
+# A margin line repeated on this share of pages is a running header/footer
+REPEAT_RATIO = 0.5
+
+_DIGITS = re.compile(r"\d+")
+_PAGE_NUMBER = re.compile(r"^(page\s*)?#(\s*(/|of)\s*#)?$")
+
+def _margin_key(text: str) -> str:
+    # Page numbers vary from page to page, so ignore digits
+    return _DIGITS.sub("#", text.strip().lower())
+
+def _exact_key(text: str) -> str:
+    return text.strip().lower()
+
+class LayoutProfile:
+    """
+    Document-wide font and position statistics, computed from the
+    per-line hints of layout-mode page text (see page_cache).
+
+    - Body text size: the size covering the most characters.
+    - Heading levels: distinct sizes clearly above body size, largest
+      first. Short, fully bold lines at body size form the deepest level.
+    - Running headers/footers: lines in the top/bottom margin whose text
+      (digits ignored) repeats on at least half of the pages. Lines styled
+      as headings must repeat exactly, so numbered titles near the top of
+      each page ("Section 1: ...", "Problem 2") are kept.
+    """
+
+    def __init__(self, body_size: float, heading_sizes: List[float], bold_headings: bool, repeated: set, repeated_exact: set):
+        self.body_size = body_size
+        self.heading_sizes = heading_sizes
+        self.bold_headings = bold_headings
+        self.repeated = repeated
+        self.repeated_exact = repeated_exact
+
+    @classmethod
+    def from_pages(cls, pages: Iterable[Tuple[int, str, Dict]]) -> "LayoutProfile":
+        size_chars: Dict[float, int] = {}
+        bold_chars = 0
+        total_chars = 0
+        margin_pages: Dict[str, int] = {}
+        exact_margin_pages: Dict[str, int] = {}
+        text_pages = 0
+
+        for _, text, hints in pages:
+            styles = hints.get("lines", [])
+            if not styles:
+                continue
+            text_pages += 1
+            page_margin_keys = set()
+            page_exact_keys = set()
+
+            for line, (size, bold, top, bottom) in zip(text.split("\n"), styles):
+                size_chars[size] = size_chars.get(size, 0) + len(line)
+                total_chars += len(line)
+                if bold:
+                    bold_chars += len(line)
+                if top < TOP_MARGIN or bottom > BOTTOM_MARGIN:
+                    page_margin_keys.add(_margin_key(line))
+                    page_exact_keys.add(_exact_key(line))
+
+            for key in page_margin_keys:
+                margin_pages[key] = margin_pages.get(key, 0) + 1
+            for key in page_exact_keys:
+                exact_margin_pages[key] = exact_margin_pages.get(key, 0) + 1
+
+        if not size_chars:
+            return cls(0.0, [], False, set(), set())
+
+        body_size = max(size_chars, key=size_chars.get)
+        heading_sizes = sorted(
+            (size for size in size_chars if size >= body_size * HEADING_SIZE_RATIO),
+            reverse=True
+        )[:MAX_HEADING_LEVELS]
+
+        # Bold only marks headings when it is rare; in all-bold decks it's just style
+        bold_headings = bold_chars < 0.1 * total_chars
+
+        min_repeats = max(3, REPEAT_RATIO * text_pages)
+        repeated = {key for key, count in margin_pages.items() if count >= min_repeats}
+        repeated_exact = {key for key, count in exact_margin_pages.items() if count >= min_repeats}
+
+        return cls(body_size, heading_sizes, bold_headings, repeated, repeated_exact)
+
+    def is_running_text(self, line: str, size: float, bold: int, top: float, bottom: float) -> bool:
+        """Whether a line is a repeated header/footer or a bare page number"""
+        if top >= TOP_MARGIN and bottom <= BOTTOM_MARGIN:
+            return False
+        key = _margin_key(line)
+        if _PAGE_NUMBER.match(key):
+            return True
+        if self.heading_level(line, size, bold) is not None:
+            return _exact_key(line) in self.repeated_exact
+        return key in self.repeated
+
+    def heading_level(self, line: str, size: float, bold: int) -> Optional[int]:
+        """1 for the largest heading font, increasing for smaller ones; None for body text"""
+        if len(line) > MAX_HEADING_CHARS or not any(c.isalpha() for c in line):
+            return None
+
+        for level, heading_size in enumerate(self.heading_sizes, start=1):
+            if size >= heading_size:
+                return level
+        if self.heading_sizes and size >= self.body_size * HEADING_SIZE_RATIO:
+            return len(self.heading_sizes)
+
+        if bold and self.bold_headings and size >= self.body_size and not line.endswith((".", ",", ";")):
+            return len(self.heading_sizes) + 1
+
+        return None
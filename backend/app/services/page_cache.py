@@ -0,0 +1,318 @@
+from app.core.config import get_settings
+from app.services.section_store import SectionNotesStore
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from itertools import chain, repeat
+import fitz
+import json
+import mmap
+import os
+import re
+import struct
+import zlib
+
+settings = get_settings()
+
+MAGIC = b"PTC1"
+TRAILER = struct.Struct("<Q4s")  # index offset, magic
+
+# Extraction modes: "text" is page.get_text(); "layout" rebuilds the text
+# line by line from get_text("html") and keeps per-line style hints
+MODES = ("text", "layout")
+
+# In MuPDF's HTML output, a <p> per text line holding its spans, each
+# wrapped in <b>/<i>/... tags. Single-span lines, the common case, are
+# matched whole; others are split into spans afterwards.
+_HTML_LINE = re.compile(
+    r'<p style="top:([-\d.]+)pt;left:[^;]*;line-height:([\d.]+)pt">(?:'
+    r'((?:</?[a-z]+>)*)<span style="[^"]*?font-size:([\d.]+)pt[^"]*">([^<]*)</span>(?:</[a-z]+>)*</p>'
+    r'|(.*?)</p>)',
+    re.DOTALL
+)
+_HTML_SPAN = re.compile(r'((?:</?[a-z]+>)*)<span style="[^"]*?font-size:([\d.]+)pt[^"]*">([^<]*)</span>')
+_CHARREF = re.compile(r"&#x([0-9a-fA-F]+);")
+_ENTITIES = (("&lt;", "<"), ("&gt;", ">"), ("&quot;", '"'), ("&apos;", "'"), ("&amp;", "&"))
+
+class PageText:
+    """
+    Read side of a page-text artifact.
+
+    The file is memory-mapped and each page is a separately compressed
+    block, so reading one page touches only that page's bytes.
+
+    File layout:
+        MAGIC | zlib(page 1 text) | zlib(page 2 text) | ... | index JSON | trailer
+    The index holds the source fingerprint, the total page count and per
+    page [page_number, offset, length, hints].
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        index_offset, magic = TRAILER.unpack_from(self._map, len(self._map) - TRAILER.size)
+        if self._map[:4] != MAGIC or magic != MAGIC:
+            self.close()
+            raise ValueError(f"Not a page-text artifact: {path}")
+
+        self.index = json.loads(self._map[index_offset:len(self._map) - TRAILER.size])
+        self.total_pages = self.index["total_pages"]
+        self.source = self.index["source"]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if getattr(self, "_map", None) is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def page_text(self, entry: List) -> str:
+        _, offset, length, _ = entry
+        return zlib.decompress(self._map[offset:offset + length]).decode("utf-8")
+
+    def iter_pages(self) -> Iterator[Tuple[int, str, Dict]]:
+        """Yield (page_number, text, layout hints) for every page"""
+        for entry in self.index["pages"]:
+            yield entry[0], self.page_text(entry), entry[3]
+
+class PageTextCache:
+    """
+    Compact per-document store of parsed page text, so re-chunking with
+    new parameters or heuristics skips PDF parsing.
+
+    Artifacts are keyed by the PDF's file name (uploads are named
+    <doc_id>.pdf) and extraction mode, and validated against the PDF's
+    size and mtime. If the PDF has been evicted, the artifact is still
+    served on its own.
+    """
+
+    def __init__(self, cache_dir: str = None):
+        self.cache_dir = Path(cache_dir or settings.page_cache_dir)
+
+    def path_for(self, pdf_path: str, mode: str = "text") -> Path:
+        suffix = ".ptc" if mode == "text" else f".{mode}.ptc"
+        return self.cache_dir / f"{Path(pdf_path).stem}{suffix}"
+
+    def has(self, pdf_path: str, mode: str = "text") -> bool:
+        """Whether an artifact of the given mode exists for `pdf_path`"""
+        return self.path_for(pdf_path, mode).exists()
+
+    def load(self, pdf_path: str, mode: str = "text") -> Optional[PageText]:
+        """Open the cached artifact for `pdf_path` if it is present and current"""
+        path = self.path_for(pdf_path, mode)
+        if not path.exists():
+            return None
+
+        try:
+            pages = PageText(path)
+        except (ValueError, OSError, struct.error):
+            path.unlink(missing_ok=True)
+            return None
+
+        try:
+            current = pages.source == _fingerprint(pdf_path)
+        except FileNotFoundError:
+            current = True  # PDF evicted; the artifact is all that's left
+        if not current:
+            pages.close()
+            return None
+
+        # Touch for LRU eviction. A concurrent eviction may have removed the
+        # file since it was opened; the open mapping stays readable
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return pages
+
+    def iter_pages(self, pdf_path: str, mode: str = "text") -> Iterator[Tuple[int, str, Dict]]:
+        """
+        Yield (page_number, text, hints) for every page, from the cache if
+        possible. Otherwise the PDF is parsed once and the artifact written
+        as pages stream past.
+        """
+        pages = self.load(pdf_path, mode)
+        if pages is not None:
+            with pages:
+                yield from pages.iter_pages()
+            return
+
+        yield from self._build(pdf_path, mode)
+
+    def total_pages(self, pdf_path: str) -> int:
+        for mode in MODES:
+            pages = self.load(pdf_path, mode)
+            if pages is not None:
+                with pages:
+                    return pages.total_pages
+
+        doc = fitz.open(pdf_path)
+        total = len(doc)
+        doc.close()
+        return total
+
+    def _build(self, pdf_path: str, mode: str) -> Iterator[Tuple[int, str, Dict]]:
+        extract = _extract_layout if mode == "layout" else _extract_text
+        path = self.path_for(pdf_path, mode)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + f".{os.getpid()}.tmp")
+
+        # Fingerprint the file being parsed, before it can be evicted or replaced
+        source = _fingerprint(pdf_path)
+        doc = fitz.open(pdf_path)
+        try:
+            with open(tmp, "wb") as out:
+                out.write(MAGIC)
+                entries = []
+
+                for page_num, page in enumerate(doc):
+                    text, hints = extract(page)
+
+                    block = zlib.compress(text.encode("utf-8"), 6)
+                    entries.append([page_num + 1, out.tell(), len(block), hints])
+                    out.write(block)
+
+                    yield page_num + 1, text, hints
+
+                index_offset = out.tell()
+                out.write(json.dumps({
+                    "source": source,
+                    "total_pages": len(doc),
+                    "pages": entries
+                }).encode("utf-8"))
+                out.write(TRAILER.pack(index_offset, MAGIC))
+
+            os.replace(tmp, path)
+        finally:
+            doc.close()
+            # Left behind only if the consumer stopped early or parsing failed
+            tmp.unlink(missing_ok=True)
+
+        enforce_storage_budget(protect={Path(pdf_path), path})
+
+def _extract_text(page) -> Tuple[str, Dict]:
+    hints = {"w": round(page.rect.width, 1), "h": round(page.rect.height, 1)}
+    return page.get_text(), hints
+
+def _extract_layout(page) -> Tuple[str, Dict]:
+    """
+    One get_text("html") call per page. Returns the page text as one line
+    per PDF text line, with hints["lines"][i] = [font size, bold, top, bottom]
+    for line i (positions as a fraction of page height).
+
+    MuPDF's HTML output carries each line's position and each span's font
+    size and weight, and is written in C, so it costs about the same as
+    plain get_text(); get_text("dict") builds a Python dict per span and
+    is 1.5-1.9x slower.
+    """
+    markup = _decode_charrefs(page.get_text("html", flags=fitz.TEXTFLAGS_TEXT))
+    height = page.rect.height or 1
+    lines, styles = [], []
+
+    for top, line_height, tags, size, text, multi in _HTML_LINE.findall(markup):
+        if not multi:
+            text = _unescape(text.strip())
+            if not text:
+                continue
+            bold = "<b>" in tags
+        else:
+            spans = [(tags, size, _unescape(text)) for tags, size, text in _HTML_SPAN.findall(multi)]
+            text = "".join(span[2] for span in spans).strip()
+            spans = [span for span in spans if span[2].strip()]
+            if not spans:
+                continue
+            # Style of the line is the style of most of its characters
+            size = max(spans, key=lambda span: len(span[2]))[1]
+            bold = all("<b>" in span[0] for span in spans)
+
+        top = float(top)
+        lines.append(text)
+        styles.append([float(size), 1 if bold else 0, round(top / height, 3), round((top + float(line_height)) / height, 3)])
+
+    hints = {"w": round(page.rect.width, 1), "h": round(page.rect.height, 1), "lines": styles}
+    return "\n".join(lines), hints
+
+def _decode_charrefs(markup: str) -> str:
+    # Non-ASCII text comes out as &#x..; references; decode them in bulk
+    if "&#x" not in markup:
+        return markup
+    parts = _CHARREF.split(markup)
+    parts[1::2] = map(chr, map(int, parts[1::2], repeat(16)))
+    return "".join(parts)
+
+def _unescape(text: str) -> str:
+    if "&" not in text:
+        return text
+    for entity, char in _ENTITIES:
+        text = text.replace(entity, char)
+    return text
+
+def _fingerprint(pdf_path: str) -> Dict:
+    stat = os.stat(pdf_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def enforce_storage_budget(budget_bytes: int = None, protect: Iterable[Path] = ()):
+    """
+    Evict least recently used uploads, page-text artifacts and reusable
+    section notes until they fit in `budget_bytes` (STORAGE_BUDGET_MB by
+    default).
+
+    A PDF is only evicted once it has a page-text artifact, since the
+    artifact is enough to re-chunk it, and never while an artifact is
+    being built from it. Artifacts whose PDF is gone are the last copy of
+    a document's text, so they go last. Paths in `protect` (files of a
+    document being processed) are never removed.
+    """
+    if budget_bytes is None:
+        budget_bytes = settings.storage_budget_mb * 1024 * 1024
+
+    cache = PageTextCache()
+    protected = {Path(p).resolve() for p in protect}
+    upload_dir = Path(settings.upload_dir)
+    building = {path.name.split(".", 1)[0] for path in cache.cache_dir.glob("*.tmp")}
+    files = []
+
+    paths = chain(upload_dir.glob("*.pdf"), cache.cache_dir.glob("*.ptc"), SectionNotesStore().iter_entries())
+    for path in paths:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        files.append((path, stat.st_size, stat.st_mtime))
+
+    used = sum(size for _, size, _ in files)
+    if used <= budget_bytes:
+        return
+
+    def evict(candidates):
+        nonlocal used
+        for path, size, _ in sorted(candidates, key=lambda item: item[2]):
+            if used <= budget_bytes:
+                return
+            if path.resolve() in protected or not path.exists():
+                continue
+            path.unlink(missing_ok=True)
+            used -= size
+
+    pdfs = [item for item in files if item[0].suffix == ".pdf"]
+    artifacts = [item for item in files if item[0].suffix == ".ptc"]
+    section_notes = [item for item in files if item[0].suffix == ".json"]
+
+    def has_pdf(artifact: Path) -> bool:
+        return (upload_dir / f"{artifact.name.split('.', 1)[0]}.pdf").exists()
+
+    # Uploads that can be re-chunked from their artifact (in the mode
+    # ingest uses, so a retry doesn't need the PDF)
+    mode = "layout" if settings.layout_extraction else "text"
+    evict([item for item in pdfs if item[0].stem not in building and cache.has(str(item[0]), mode)])
+    # Then artifacts that can be rebuilt from their PDF, section notes
+    # (regenerating them costs Claude calls), and last artifacts that can't
+    evict([item for item in artifacts if has_pdf(item[0])])
+    evict(section_notes)
+    evict([item for item in artifacts if not has_pdf(item[0])])
@@ -1,31 +1,74 @@
-import fitz
-from typing import List, Dict
+from app.services.page_cache import PageTextCache
+from app.services.layout import LayoutProfile
+from typing import List, Dict, Iterator
 import re
 
 class Chunk:
-    def __init__(self, text: str, page: int, chunk_index: int, heading: str = None):
+    # Slots keep per-chunk overhead small when many chunks are in flight
+    __slots__ = ("text", "page", "chunk_index", "heading", "heading_path", "chunk_id", "embedding")
+
+    def __init__(self, text: str, page: int, chunk_index: int, heading: str = None, heading_path: str = None):
         self.text = text
         self.page = page
         self.chunk_index = chunk_index
         self.heading = heading
+        self.heading_path = heading_path  # full hierarchy, "Chapter > Section > ..."
         self.chunk_id = f"page{page}_chunk{chunk_index}"
+        self.embedding = None  # array('f') once embedded
+
+    def to_dict(self) -> Dict:
+        return {
+            "chunk_id": self.chunk_id,
+            "text": self.text,
+            "page": self.page,
+            "heading": self.heading,
+            "heading_path": self.heading_path,
+            "chunk_index": self.chunk_index
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Chunk":
+        return cls(
+            text=data["text"],
+            page=data["page"],
+            chunk_index=data["chunk_index"],
+            heading=data.get("heading"),
+            heading_path=data.get("heading_path")
+        )
+
+# In layout mode, chunks are grouped into sections by this many heading levels
+SECTION_DEPTH = 2
 
 class PDFProcessor:
-    def __init__(self, max_tokens: int = 800, overlap: int = 200):
+    def __init__(
+        self,
+        max_tokens: int = 800,
+        overlap: int = 200,
+        page_cache: PageTextCache = None,
+        layout_mode: bool = False
+    ):
         self.max_tokens = max_tokens
         self.overlap = overlap
+        # Parsed page text is cached, so re-chunking skips PDF parsing
+        self.page_cache = page_cache or PageTextCache()
+        # Detect headings from font statistics instead of "short first line"
+        self.layout_mode = layout_mode
 
     def extract_and_chunk(self, pdf_path: str) -> List[Dict]:
         """
         Extract text from PDF and create semantic chunks
         """
-        doc = fitz.open(pdf_path)
-        chunks = []
+        return [chunk.to_dict() for chunk in self.iter_chunks(pdf_path)]
 
-        for page_num, page in enumerate(doc):
-            # Extract text
-            text = page.get_text()
+    def iter_chunks(self, pdf_path: str) -> Iterator[Chunk]:
+        """
+        Yield chunks page by page, so only one page is held at a time
+        """
+        if self.layout_mode:
+            yield from self._iter_layout_chunks(pdf_path)
+            return
 
+        for page_number, text, hints in self.page_cache.iter_pages(pdf_path):
             if not text.strip():
                 continue
 
@@ -34,30 +77,74 @@ class PDFProcessor:
             heading = lines[0] if lines and len(lines[0]) < 100 else None
 
             # Chunk the page text
-            page_chunks = self._chunk_text(text, page_num + 1, heading)
-            chunks.extend(page_chunks)
-
-        doc.close()
-
-        return [
-            {
-                "chunk_id": chunk.chunk_id,
-                "text": chunk.text,
-                "page": chunk.page,
-                "heading": chunk.heading,
-                "chunk_index": chunk.chunk_index
-            }
-            for chunk in chunks
-        ]
-
-    def _chunk_text(self, text: str, page: int, heading: str) -> List[Chunk]:
+            yield from self._chunk_text(text, page_number, heading)
+
+    def _iter_layout_chunks(self, pdf_path: str) -> Iterator[Chunk]:
+        """
+        Layout-aware chunking: headings come from document-wide font size
+        and weight statistics, running headers/footers are dropped, and
+        the heading hierarchy carries across pages.
+
+        Needs two passes: the first parses the PDF once (writing the
+        layout artifact) to gather statistics, the second reads the
+        artifact back, so chunks start flowing only after parsing.
+        """
+        profile = LayoutProfile.from_pages(self.page_cache.iter_pages(pdf_path, mode="layout"))
+        stack = []  # [(level, heading text)]
+
+        for page_number, text, hints in self.page_cache.iter_pages(pdf_path, mode="layout"):
+            # Content before the page's first heading continues the previous section
+            segments = [{"headings": list(stack), "lines": [], "has_body": False}]
+            last_level = None
+
+            for line, (size, bold, top, bottom) in zip(text.split("\n"), hints.get("lines", [])):
+                if profile.is_running_text(line, size, bold, top, bottom):
+                    continue
+
+                level = profile.heading_level(line, size, bold)
+                segment = segments[-1]
+
+                if level is None:
+                    segment["lines"].append(line)
+                    segment["has_body"] = True
+                elif level == last_level:
+                    # Heading wrapped onto several lines
+                    stack[-1] = (level, f"{stack[-1][1]} {line}")
+                    segment["headings"][-1] = stack[-1]
+                    segment["lines"][-1] = stack[-1][1]
+                else:
+                    while stack and stack[-1][0] >= level:
+                        stack.pop()
+                    stack.append((level, line))
+                    segments.append({"headings": list(stack), "lines": [line], "has_body": False})
+
+                last_level = level
+
+            chunk_index = 0
+            for segment in segments:
+                # A heading with nothing under it on this page gets its text from the next page
+                if not segment["has_body"]:
+                    continue
+
+                names = [name for _, name in segment["headings"]]
+                page_chunks = self._chunk_text(
+                    "\n".join(segment["lines"]),
+                    page_number,
+                    " > ".join(names[:SECTION_DEPTH]) or None,
+                    start_index=chunk_index,
+                    heading_path=" > ".join(names) or None
+                )
+                chunk_index += len(page_chunks)
+                yield from page_chunks
+
+    def _chunk_text(self, text: str, page: int, heading: str, start_index: int = 0, heading_path: str = None) -> List[Chunk]:
         """
         Split text into chunks with overlap
         """
         # Simple word-based chunking
         words = text.split()
         chunks = []
-        chunk_index = 0
+        chunk_index = start_index
 
         # Approximate tokens (1 token ≈ 0.75 words)
         words_per_chunk = int(self.max_tokens * 0.75)
@@ -72,7 +159,8 @@ class PDFProcessor:
                 text=chunk_text,
                 page=page,
                 chunk_index=chunk_index,
-                heading=heading
+                heading=heading,
+                heading_path=heading_path
             ))
 
             chunk_index += 1
@@ -82,7 +170,4 @@ class PDFProcessor:
 
     def get_total_pages(self, pdf_path: str) -> int:
         """Get total number of pages in PDF"""
-        doc = fitz.open(pdf_path)
-        total = len(doc)
-        doc.close()
-        return total
\ No newline at end of file
+        return self.page_cache.total_pages(pdf_path)
\ No newline at end of file
@@ -1,14 +1,33 @@
 from pinecone import Pinecone, ServerlessSpec
 from app.core.config import get_settings
-from typing import List, Dict
+from typing import List, Dict, Iterable, Iterator, Callable, Tuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import json
+import time
 
 settings = get_settings()
 
+# Upsert batching: Pinecone caps a request at 2MB / 1000 vectors.
+# Batches are sized from each vector's serialized JSON; float32 values
+# widened to Python floats take ~22 bytes each, so estimates undercount.
+MAX_BATCH_BYTES = 2 * 1024 * 1024 - 64 * 1024  # headroom for the request envelope
+MAX_BATCH_VECTORS = 1000
+MAX_IN_FLIGHT = 4
+MAX_RETRIES = 3
+RETRY_BACKOFF_SECONDS = 0.5
+
 class PineconeClient:
-    def __init__(self):
-        self.pc = Pinecone(api_key=settings.pinecone_api_key)
+    def __init__(self, index=None):
         self.index_name = "notes-ai"
 
+        # `index` lets callers pass a stand-in for the Pinecone index and
+        # skip connecting (and creating the index) over the network
+        if index is not None:
+            self.index = index
+            return
+
+        self.pc = Pinecone(api_key=settings.pinecone_api_key)
+
         # Create index if it doesn't exist
         if self.index_name not in self.pc.list_indexes().names():
             self.pc.create_index(
@@ -23,28 +42,111 @@ class PineconeClient:
 
         self.index = self.pc.Index(self.index_name)
 
-    def upsert_chunks(self, doc_id: str, chunks: List[Dict]):
-        # Store chunks with embeddings in Pinecone
-        vectors = [
-            {
+    def upsert_chunks(
+        self,
+        doc_id: str,
+        chunks: Iterable[Dict],
+        on_batch: Callable[[List[str]], None] = None,
+        max_in_flight: int = MAX_IN_FLIGHT
+    ) -> int:
+        """
+        Store chunks with embeddings in Pinecone.
+
+        `chunks` is consumed lazily: batches are built as vectors arrive,
+        capped by serialized payload size, and up to `max_in_flight` upsert
+        requests run concurrently, each retried on its own. `on_batch` is
+        called with the chunk ids of every batch once it is stored.
+        Returns the number of vectors upserted.
+        """
+        total = 0
+        in_flight = set()
+
+        with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+            try:
+                for batch, chunk_ids in self._iter_batches(doc_id, chunks):
+                    if len(in_flight) >= max_in_flight:
+                        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        total += self._collect(done, on_batch)
+                    in_flight.add(pool.submit(self._upsert_batch, doc_id, batch, chunk_ids))
+            except BaseException:
+                # Report batches that still got stored, so a resume skips them
+                done, _ = wait(in_flight)
+                self._collect(done, on_batch, raise_errors=False)
+                raise
+
+            done, _ = wait(in_flight)
+            total += self._collect(done, on_batch)
+
+        return total
+
+    def _iter_batches(self, doc_id: str, chunks: Iterable[Dict]) -> Iterator[Tuple[List[Dict], List[str]]]:
+        """
+        Group chunks into upsert batches bounded by payload bytes
+        """
+        batch, chunk_ids, batch_bytes = [], [], 0
+
+        for chunk in chunks:
+            values = chunk["embedding"]
+            if not isinstance(values, list):
+                values = values.tolist()
+
+            text = chunk["text"][:1000]  # Limit metadata size
+            vector = {
                 "id": f"{doc_id}_{chunk['chunk_id']}",
-                "values": chunk["embedding"],
+                "values": values,
                 "metadata": {
                     "doc_id": doc_id,
-                    "text": chunk["text"][:1000],  # Limit metadata size
+                    "text": text,
                     "page": chunk["page"],
                     "heading": chunk.get("heading") or "",  # ← Convert None to ""
+                    "heading_path": chunk.get("heading_path") or "",
                     "chunk_index": chunk["chunk_index"]
                 }
             }
-            for chunk in chunks
-        ]
+            vector_bytes = len(json.dumps(vector)) + 2  # list separator
+
+            if batch and (batch_bytes + vector_bytes > MAX_BATCH_BYTES or len(batch) >= MAX_BATCH_VECTORS):
+                yield batch, chunk_ids
+                batch, chunk_ids, batch_bytes = [], [], 0
+
+            batch.append(vector)
+            chunk_ids.append(chunk["chunk_id"])
+            batch_bytes += vector_bytes
 
-        # Upsert in batches of 100
-        batch_size = 100
-        for i in range(0, len(vectors), batch_size):
-            batch = vectors[i:i + batch_size]
-            self.index.upsert(vectors=batch, namespace=doc_id)
+        if batch:
+            yield batch, chunk_ids
+
+    def _upsert_batch(self, doc_id: str, batch: List[Dict], chunk_ids: List[str]) -> List[str]:
+        """
+        Upsert one batch, retrying with exponential backoff
+        """
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                self.index.upsert(vectors=batch, namespace=doc_id)
+                return chunk_ids
+            except Exception:
+                if attempt == MAX_RETRIES:
+                    raise
+                time.sleep(RETRY_BACKOFF_SECONDS * 2 ** attempt)
+
+    def _collect(self, done, on_batch: Callable[[List[str]], None], raise_errors: bool = True) -> int:
+        """
+        Report every stored batch in `done` to `on_batch`, then raise the
+        first failure (unless `raise_errors` is False)
+        """
+        count = 0
+        error = None
+        for future in done:
+            if future.exception() is not None:
+                error = error or future.exception()
+                continue
+            chunk_ids = future.result()
+            if on_batch:
+                on_batch(chunk_ids)
+            count += len(chunk_ids)
+        if error is not None and raise_errors:
+            raise error
+        return count
 
     def fetch_all(self, doc_id: str) -> List[Dict]:
         """
@@ -63,6 +165,7 @@ class PineconeClient:
                 "text": match.metadata["text"],
                 "page": match.metadata["page"],
                 "heading": match.metadata.get("heading"),
+                "heading_path": match.metadata.get("heading_path"),
                 "chunk_index": match.metadata["chunk_index"]
             }
             for match in results.matches
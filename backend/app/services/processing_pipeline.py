@@ -1,61 +1,66 @@
-from app.services.pdf_processor import PDFProcessor
+from app.services.pdf_processor import PDFProcessor, Chunk
 from app.services.embeddings import EmbeddingService
 from app.services.pinecone_client import PineconeClient
+from app.services.checkpoints import CheckpointStore
+from app.services.streaming import Pipe, run_stage
 from app.core.database import get_supabase
+from app.core import jobs
+from app.core.config import get_settings
 from pathlib import Path
+from typing import Iterable, Iterator, Set, Tuple
+from array import array
+import asyncio
 import time
 
-async def process_pdf_pipeline(doc_id: str, pdf_path: str):
+settings = get_settings()
+
+EMBED_BATCH_SIZE = 20
+STAGE_QUEUE_SIZE = 64  # chunks buffered between two stages
+STAGE_JOIN_TIMEOUT = 30  # seconds to wait for a cancelled stage to exit
+
+class _IngestStats:
+    def __init__(self, total_pages: int):
+        self.total_pages = total_pages
+        self.last_page = 0
+        self.extracted = 0
+        self.skipped = 0
+        self.upserted = 0
+
+    def progress(self) -> int:
+        """Map stored chunks onto 10-90%, estimating the total from pages read so far"""
+        if not self.extracted:
+            return 10
+        estimated_total = self.extracted * self.total_pages / max(self.last_page, 1)
+        done = self.skipped + self.upserted
+        return 10 + int(80 * min(done / estimated_total, 1))
+
+async def process_pdf_pipeline(doc_id: str, pdf_path: str, claim_id: str):
     """
     Complete PDF processing pipeline:
     1. Extract and chunk
     2. Generate embeddings
     3. Store in Pinecone
     4. Update database
-    """
-    supabase = get_supabase()
 
+    Steps 1-3 run as overlapping stages connected by bounded queues, so
+    peak memory does not grow with page count. Each stage is checkpointed
+    per doc_id, so re-running the pipeline for a document continues from
+    the last completed unit. The final status is only written while
+    `claim_id` still holds the document.
+    """
     try:
-        # Step 1: Extract and chunk
         update_job_status(doc_id, "processing", 10, "Extracting text from PDF...")
 
-        processor = PDFProcessor()
-        chunks = processor.extract_and_chunk(pdf_path)
-        total_pages = processor.get_total_pages(pdf_path)
-
-        if not chunks:
-            raise Exception("No text extracted from PDF")
-
-        # Step 2: Generate embeddings
-        update_job_status(doc_id, "processing", 30, f"Generating embeddings for {len(chunks)} chunks...")
-
-        embedding_service = EmbeddingService()
-
-        for i, chunk in enumerate(chunks):
-            chunk["embedding"] = embedding_service.embed(chunk["text"])
-
-            # Update progress
-            progress = 30 + int(50 * (i + 1) / len(chunks))
-            if i % 10 == 0:  # Update every 10 chunks
-                update_job_status(
-                    doc_id,
-                    "processing",
-                    progress,
-                    f"Processing chunk {i+1}/{len(chunks)}..."
-                )
-
-        # Step 3: Store in Pinecone
-        update_job_status(doc_id, "processing", 85, "Storing vectors in database...")
-
-        pinecone_client = PineconeClient()
-        pinecone_client.upsert_chunks(doc_id, chunks)
+        # Steps 1-3: Extract, embed and store (off the event loop)
+        total_pages, total_chunks = await asyncio.to_thread(_ingest, doc_id, pdf_path)
 
         # Step 4: Update document record
-        supabase.table("documents").update({
+        if not jobs.release(doc_id, claim_id, {
             "status": "ready",
             "total_pages": total_pages,
-            "total_chunks": len(chunks)
-        }).eq("id", doc_id).execute()
+            "total_chunks": total_chunks
+        }):
+            return
 
         # Step 5: Update job status
         update_job_status(doc_id, "ready", 100, "Processing complete. Ready for note generation.")
@@ -63,17 +68,143 @@ async def process_pdf_pipeline(doc_id: str, pdf_path: str):
     except Exception as e:
         # Update error status
         error_msg = str(e)
-        supabase.table("documents").update({
-            "status": "failed",
-            "error_message": error_msg
-        }).eq("id", doc_id).execute()
-
-        # Truncate error for job_status (max 100 chars)
-        short_error = error_msg[:97] + "..." if len(error_msg) > 100 else error_msg
-        update_job_status(doc_id, "failed", 0, f"Error: {short_error}")
+        # After a takeover the retry owns the document's status
+        if jobs.release(doc_id, claim_id, {"status": "failed", "error_message": error_msg}):
+            # Truncate error for job_status (max 100 chars)
+            short_error = error_msg[:97] + "..." if len(error_msg) > 100 else error_msg
+            update_job_status(doc_id, "failed", 0, f"Error: {short_error}")
 
         raise
 
+def _ingest(doc_id: str, pdf_path: str) -> Tuple[int, int]:
+    """
+    Run extract -> embed -> upsert as a streaming pipeline.
+    Returns (total_pages, total_chunks).
+    """
+    store = CheckpointStore(doc_id)
+    processor = PDFProcessor(layout_mode=settings.layout_extraction)
+    stats = _IngestStats(processor.get_total_pages(pdf_path))
+
+    # Resume state: chunks already in Pinecone are skipped, and embeddings
+    # saved for the rest are reused instead of re-requested. They are read
+    # in step with the chunks rather than loaded up front
+    upserted = store.load_upserted()
+    saved_embeddings = store.iter_embeddings(skip=upserted)
+
+    chunks_pipe = Pipe(STAGE_QUEUE_SIZE)
+    embedded_pipe = Pipe(STAGE_QUEUE_SIZE)
+    stages = [
+        run_stage(_extract_chunks(store, processor, pdf_path, upserted, stats), chunks_pipe, f"extract-{doc_id}"),
+        run_stage(_embed_chunks(chunks_pipe, EmbeddingService(), saved_embeddings, store), embedded_pipe, f"embed-{doc_id}")
+    ]
+
+    def on_batch(chunk_ids):
+        store.mark_upserted(chunk_ids)
+        stats.upserted += len(chunk_ids)
+        update_job_status(
+            doc_id,
+            "processing",
+            stats.progress(),
+            f"Stored {stats.skipped + stats.upserted} chunks ({stats.last_page}/{stats.total_pages} pages read)..."
+        )
+
+    try:
+        PineconeClient().upsert_chunks(
+            doc_id,
+            (dict(chunk.to_dict(), embedding=chunk.embedding) for chunk in embedded_pipe),
+            on_batch=on_batch
+        )
+    finally:
+        # Unblock upstream stages if the upsert stage stopped early
+        chunks_pipe.cancel()
+        embedded_pipe.cancel()
+        for stage in stages:
+            # A stage stuck inside an API call is a daemon thread, so
+            # don't let it hold up reporting the failure
+            stage.join(timeout=STAGE_JOIN_TIMEOUT)
+
+    if not stats.extracted:
+        raise Exception("No text extracted from PDF")
+
+    store.mark_ingested()
+
+    return stats.total_pages, stats.extracted
+
+def _extract_chunks(
+    store: CheckpointStore,
+    processor: PDFProcessor,
+    pdf_path: str,
+    upserted: Set[str],
+    stats: _IngestStats
+) -> Iterator[Chunk]:
+    """
+    Stage 1: yield chunks still to be stored, checkpointing them page by page
+    """
+    for chunk in _chunk_source(store, processor, pdf_path):
+        stats.extracted += 1
+        stats.last_page = chunk.page
+        if chunk.chunk_id in upserted:
+            stats.skipped += 1
+            continue
+        yield chunk
+
+def _chunk_source(store: CheckpointStore, processor: PDFProcessor, pdf_path: str) -> Iterator[Chunk]:
+    if store.has_chunks():
+        for data in store.iter_chunks():
+            yield Chunk.from_dict(data)
+        return
+
+    store.begin_chunks()
+    page_chunks = []
+    for chunk in processor.iter_chunks(pdf_path):
+        if page_chunks and chunk.page != page_chunks[0].page:
+            store.append_chunks([c.to_dict() for c in page_chunks])
+            yield from page_chunks
+            page_chunks = []
+        page_chunks.append(chunk)
+
+    if page_chunks:
+        store.append_chunks([c.to_dict() for c in page_chunks])
+        yield from page_chunks
+    store.finish_chunks()
+
+def _embed_chunks(
+    chunks: Iterable[Chunk],
+    embedding_service: EmbeddingService,
+    saved_embeddings: Iterable[Tuple[str, array]],
+    store: CheckpointStore
+) -> Iterator[Chunk]:
+    """
+    Stage 2: attach float32 embeddings, batching API calls.
+
+    Saved embeddings are in chunk order, like `chunks`, so they are
+    matched up by reading both in step.
+    """
+    saved_embeddings = iter(saved_embeddings)
+    saved = next(saved_embeddings, None)
+    batch = []
+    for chunk in chunks:
+        if saved is not None and saved[0] == chunk.chunk_id:
+            chunk.embedding = saved[1]
+            saved = next(saved_embeddings, None)
+            yield chunk
+            continue
+
+        batch.append(chunk)
+        if len(batch) >= EMBED_BATCH_SIZE:
+            yield from _embed_batch(batch, embedding_service, store)
+            batch = []
+
+    if batch:
+        yield from _embed_batch(batch, embedding_service, store)
+
+def _embed_batch(batch, embedding_service: EmbeddingService, store: CheckpointStore) -> Iterator[Chunk]:
+    vectors = embedding_service.embed_batch_f32([chunk.text for chunk in batch])
+    store.append_embeddings({chunk.chunk_id: vector for chunk, vector in zip(batch, vectors)})
+    for chunk, vector in zip(batch, vectors):
+        chunk.embedding = vector
+        yield chunk
+
 def update_job_status(doc_id: str, status: str, progress: int, stage: str):
     """Helper to update job status"""
     supabase = get_supabase()
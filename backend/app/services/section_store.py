@@ -0,0 +1,50 @@
+from app.core.config import get_settings
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+import json
+import os
+
+settings = get_settings()
+
+class SectionNotesStore:
+    """
+    Generated section notes keyed by a fingerprint of the section's
+    content, so an unchanged section in a re-uploaded (or duplicate)
+    document reuses its notes instead of calling Claude again.
+
+    Entries live at <section_cache_dir>/<fp[:2]>/<fp>.json and count
+    toward STORAGE_BUDGET_MB.
+    """
+
+    def __init__(self, base_dir: str = None):
+        self.root = Path(base_dir or settings.section_cache_dir)
+
+    def _path(self, fingerprint: str) -> Path:
+        return self.root / fingerprint[:2] / f"{fingerprint}.json"
+
+    def get(self, fingerprint: str) -> Optional[Dict]:
+        path = self._path(fingerprint)
+        try:
+            with open(path, encoding="utf-8") as f:
+                notes = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        # Touch for LRU eviction (see page_cache.enforce_storage_budget);
+        # the file may have been evicted since it was read
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return notes
+
+    def iter_entries(self) -> Iterator[Path]:
+        return self.root.glob("*/*.json")
+
+    def put(self, fingerprint: str, notes: Dict):
+        path = self._path(fingerprint)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + f".{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(notes, f)
+        os.replace(tmp, path)
@@ -0,0 +1,75 @@
+from typing import Iterable, Iterator, Any
+import queue
+import threading
+
+_DONE = object()
+
+class PipelineCancelled(Exception):
+    pass
+
+class _StageError:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+class Pipe:
+    """
+    Bounded queue between two pipeline stages.
+
+    The producer blocks once `maxsize` items are waiting, which caps how
+    much data the pipeline holds at once. Cancelling the pipe unblocks
+    both ends: a producer whose consumer has gone away, and a consumer
+    waiting on a producer that will never finish.
+    """
+
+    def __init__(self, maxsize: int):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._cancelled = threading.Event()
+
+    def put(self, item: Any):
+        while True:
+            if self._cancelled.is_set():
+                raise PipelineCancelled()
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def __iter__(self) -> Iterator[Any]:
+        while True:
+            if self._cancelled.is_set():
+                raise PipelineCancelled()
+            try:
+                item = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                return
+            if isinstance(item, _StageError):
+                raise item.error
+            yield item
+
+def run_stage(items: Iterable[Any], out: Pipe, name: str) -> threading.Thread:
+    """
+    Drain `items` into `out` on a background thread. An exception raised
+    while producing is handed to the consumer of `out`.
+    """
+    def target():
+        try:
+            for item in items:
+                out.put(item)
+            out.put(_DONE)
+        except PipelineCancelled:
+            pass
+        except BaseException as e:
+            try:
+                out.put(_StageError(e))
+            except PipelineCancelled:
+                pass
+
+    thread = threading.Thread(target=target, name=name, daemon=True)
+    thread.start()
+    return thread
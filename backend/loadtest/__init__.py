@@ -0,0 +1 @@
+"""Load-testing harness for the NotesAI API (see __main__.py for usage)"""
@@ -0,0 +1,117 @@
+"""
+Usage (from backend/):
+
+    # Drive the app in-process with stubbed services
+    python -m loadtest run --scenario loadtest/scenarios/production.json
+
+    # Or against a local uvicorn running the stubbed app
+    python -m loadtest serve --port 8001
+    python -m loadtest run --url http://127.0.0.1:8001 --users 50 --duration 60
+
+Command-line options override the scenario file.
+"""
+import argparse
+import asyncio
+import json
+
+import httpx
+
+from loadtest import runner, stubs
+
+def _parse_mix(value: str) -> dict:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight)
+    return mix
+
+def _load_scenario(args) -> dict:
+    scenario = {
+        "mix": runner.DEFAULT_MIX,
+        "users": 20,
+        "duration": 30,
+        "think": 0.0,
+        "processing_seconds": 2.0,
+        "generation_seconds": 5.0,
+    }
+    if args.scenario:
+        with open(args.scenario) as f:
+            scenario.update(json.load(f))
+    for key in ("users", "duration", "think"):
+        if getattr(args, key) is not None:
+            scenario[key] = getattr(args, key)
+    if args.mix:
+        scenario["mix"] = _parse_mix(args.mix)
+    return scenario
+
+async def _run_in_process(scenario: dict, seed: int):
+    app, _, ids, lag = stubs.build_app(
+        processing_seconds=scenario["processing_seconds"],
+        generation_seconds=scenario["generation_seconds"]
+    )
+    transport = httpx.ASGITransport(app=stubs.detach_background_tasks(app))
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+        lag.start()
+        result = await runner.run(
+            client, scenario["mix"], ids, scenario["users"], scenario["duration"], scenario["think"], seed
+        )
+        lag.stop()
+
+    return result, lag.samples
+
+async def _run_remote(url: str, scenario: dict, seed: int):
+    limits = httpx.Limits(max_connections=scenario["users"])
+
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        ids = (await client.get("/__loadtest/docs")).json()
+        await client.post("/__loadtest/lag/reset")
+        result = await runner.run(
+            client, scenario["mix"], ids, scenario["users"], scenario["duration"], scenario["think"], seed
+        )
+        samples = (await client.get("/__loadtest/lag")).json()["samples"]
+
+    return result, samples
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m loadtest", description="NotesAI API load generator")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Replay a traffic mix and report latencies")
+    run.add_argument("--url", help="Target a running server instead of the in-process app")
+    run.add_argument("--scenario", help="JSON file with mix/users/duration/think")
+    run.add_argument("--mix", help="Weights, e.g. status=85,notes_get=8,upload=4,generate=3")
+    run.add_argument("--users", type=int, help="Concurrent virtual users")
+    run.add_argument("--duration", type=float, help="Seconds to run")
+    run.add_argument("--think", type=float, help="Mean think time between a user's requests (s)")
+    run.add_argument("--seed", type=int, default=0)
+
+    serve = sub.add_parser("serve", help="Run the stubbed app under uvicorn")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8001)
+    serve.add_argument("--scenario", help="JSON file with processing/generation_seconds")
+
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        import uvicorn
+
+        scenario = {"processing_seconds": 2.0, "generation_seconds": 5.0}
+        if args.scenario:
+            with open(args.scenario) as f:
+                scenario.update(json.load(f))
+        app, _, _, _ = stubs.build_app(scenario["processing_seconds"], scenario["generation_seconds"])
+        # Workers would each get their own in-memory database, so run one process
+        uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+        return
+
+    scenario = _load_scenario(args)
+    if args.url:
+        result, samples = asyncio.run(_run_remote(args.url, scenario, args.seed))
+    else:
+        result, samples = asyncio.run(_run_in_process(scenario, args.seed))
+
+    print(runner.report(result["elapsed"], result["stats"], samples))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Asyncio load generator for the NotesAI API.
+
+Virtual users pick operations from a weighted traffic mix and fire them
+at the app, either in-process through an ASGI transport or over HTTP at
+a running server. Latencies are reported per route together with
+throughput and event-loop lag.
+"""
+from typing import Callable, Dict, List, Optional
+import asyncio
+import random
+import time
+
+import httpx
+
+# Smallest well-formed PDF; the stubbed pipeline never parses it
+SAMPLE_PDF = (
+    b"%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n"
+    b"2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n"
+    b"3 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 612 792]>>endobj\n"
+    b"trailer<</Root 1 0 R>>\n%%EOF\n"
+)
+
+DEFAULT_MIX = {"status": 85, "notes_get": 8, "upload": 4, "generate": 3}
+
+class Stats:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.codes: Dict[str, Dict[int, int]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def record(self, route: str, seconds: float, status: Optional[int]):
+        self.latencies.setdefault(route, []).append(seconds)
+        codes = self.codes.setdefault(route, {})
+        if status is None:
+            self.errors[route] = self.errors.get(route, 0) + 1
+        else:
+            codes[status] = codes.get(status, 0) + 1
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(int(round(pct / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+class TrafficMix:
+    def __init__(self, weights: Dict[str, float], ids: Dict[str, List[str]]):
+        unknown = set(weights) - set(OPERATIONS)
+        if unknown:
+            raise ValueError(f"Unknown operations in mix: {', '.join(sorted(unknown))}")
+        self.names = [name for name, weight in weights.items() if weight > 0]
+        self.weights = [weights[name] for name in self.names]
+        self.ids = ids
+        # Documents created during the run are polled like seeded ones
+        self.all_ids = ids["ready"] + ids["completed"]
+
+    def pick(self, rng: random.Random) -> str:
+        return rng.choices(self.names, self.weights)[0]
+
+async def _status(client: httpx.AsyncClient, mix: TrafficMix, rng: random.Random):
+    return "GET /api/status/{doc_id}", await client.get(f"/api/status/{rng.choice(mix.all_ids)}")
+
+async def _notes_get(client: httpx.AsyncClient, mix: TrafficMix, rng: random.Random):
+    return "GET /api/notes/{doc_id}", await client.get(f"/api/notes/{rng.choice(mix.ids['completed'])}")
+
+async def _generate(client: httpx.AsyncClient, mix: TrafficMix, rng: random.Random):
+    return "POST /api/notes/generate/{doc_id}", await client.post(f"/api/notes/generate/{rng.choice(mix.ids['ready'])}")
+
+async def _upload(client: httpx.AsyncClient, mix: TrafficMix, rng: random.Random):
+    response = await client.post("/api/upload", files={"file": ("lecture.pdf", SAMPLE_PDF, "application/pdf")})
+    if response.status_code == 200:
+        mix.all_ids.append(response.json()["doc_id"])
+    return "POST /api/upload", response
+
+async def _health(client: httpx.AsyncClient, mix: TrafficMix, rng: random.Random):
+    return "GET /health", await client.get("/health")
+
+OPERATIONS: Dict[str, Callable] = {
+    "status": _status,
+    "notes_get": _notes_get,
+    "generate": _generate,
+    "upload": _upload,
+    "health": _health,
+}
+
+async def _user(client: httpx.AsyncClient, mix: TrafficMix, stats: Stats, deadline: float, think: float, seed: int):
+    rng = random.Random(seed)
+
+    while time.perf_counter() < deadline:
+        op = mix.pick(rng)
+        start = time.perf_counter()
+        try:
+            route, response = await OPERATIONS[op](client, mix, rng)
+            stats.record(route, time.perf_counter() - start, response.status_code)
+        except httpx.HTTPError:
+            stats.record(op, time.perf_counter() - start, None)
+
+        if think:
+            await asyncio.sleep(rng.expovariate(1 / think))
+
+async def run(
+    client: httpx.AsyncClient,
+    weights: Dict[str, float],
+    ids: Dict[str, List[str]],
+    users: int,
+    duration: float,
+    think: float = 0.0,
+    seed: int = 0
+) -> Dict:
+    """
+    Drive `client` with `users` concurrent virtual users for `duration`
+    seconds and return the raw results
+    """
+    mix = TrafficMix(weights, ids)
+    stats = Stats()
+
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*(
+        _user(client, mix, stats, deadline, think, seed + i)
+        for i in range(users)
+    ))
+    elapsed = time.perf_counter() - start
+
+    return {"elapsed": elapsed, "stats": stats}
+
+def report(elapsed: float, stats: Stats, lag_samples: List[float]) -> str:
+    lines = []
+    total = sum(len(v) for v in stats.latencies.values())
+    lines.append(f"Requests: {total} in {elapsed:.1f}s ({total / elapsed:.1f} req/s)")
+    lines.append("")
+    lines.append(f"{'route':<38}{'count':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  codes")
+
+    for route in sorted(stats.latencies):
+        values = stats.latencies[route]
+        codes = " ".join(f"{code}:{n}" for code, n in sorted(stats.codes.get(route, {}).items()))
+        if stats.errors.get(route):
+            codes += f" err:{stats.errors[route]}"
+        lines.append(
+            f"{route:<38}{len(values):>8}{len(values) / elapsed:>9.1f}"
+            f"{percentile(values, 50) * 1000:>9.1f}{percentile(values, 95) * 1000:>9.1f}"
+            f"{percentile(values, 99) * 1000:>9.1f}  {codes}"
+        )
+
+    lines.append("")
+    if lag_samples:
+        lines.append(
+            f"Event-loop lag: p50 {percentile(lag_samples, 50) * 1000:.1f} ms, "
+            f"p99 {percentile(lag_samples, 99) * 1000:.1f} ms, "
+            f"max {max(lag_samples) * 1000:.1f} ms"
+        )
+    else:
+        lines.append("Event-loop lag: no samples")
+
+    return "\n".join(lines)
@@ -0,0 +1,269 @@
+"""
+Stand-ins for the app's external services, so the FastAPI app can be
+driven under load without Supabase, Pinecone, OpenAI or Claude.
+
+`build_app()` must be called before anything imports `app.*`: it fills in
+dummy settings, swaps `app.core.database` for an in-memory Supabase and
+replaces the background pipelines with short simulated jobs.
+"""
+from datetime import datetime, timezone
+from typing import Dict, List
+import asyncio
+import copy
+import os
+import sys
+import tempfile
+import threading
+import time
+import types
+import uuid
+
+DUMMY_ENV = {
+    "SUPABASE_URL": "https://loadtest.supabase.co",
+    "SUPABASE_ANON_KEY": "loadtest",
+    "SUPABASE_SERVICE_KEY": "loadtest",
+    "ANTHROPIC_API_KEY": "loadtest",
+    "OPENAI_API_KEY": "loadtest",
+    "PINECONE_API_KEY": "loadtest",
+    "PINECONE_ENVIRONMENT": "us-east-1",
+}
+
+class _Result:
+    def __init__(self, data: List[Dict]):
+        self.data = data
+
+class _Query:
+    """The subset of the postgrest query builder the app uses"""
+
+    def __init__(self, db: "FakeSupabase", table: str):
+        self.db = db
+        self.table_name = table
+        self.action = "select"
+        self.payload = None
+        self.filters = []
+        self.order_by = None
+        self.limit_n = None
+
+    def select(self, *columns):
+        self.action = "select"
+        return self
+
+    def insert(self, payload: Dict):
+        self.action, self.payload = "insert", payload
+        return self
+
+    def update(self, payload: Dict):
+        self.action, self.payload = "update", payload
+        return self
+
+    def eq(self, column: str, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def lt(self, column: str, value):
+        self.filters.append(lambda row: row.get(column) is not None and row[column] < value)
+        return self
+
+    def order(self, column: str, desc: bool = False):
+        self.order_by = (column, desc)
+        return self
+
+    def limit(self, n: int):
+        self.limit_n = n
+        return self
+
+    def execute(self) -> _Result:
+        return self.db._execute(self)
+
+class FakeSupabase:
+    """In-memory tables with Supabase-style, thread-safe writes"""
+
+    def __init__(self):
+        self.tables: Dict[str, List[Dict]] = {"documents": [], "job_status": [], "notes": []}
+        self.lock = threading.Lock()
+
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
+
+    def _execute(self, query: _Query) -> _Result:
+        with self.lock:
+            rows = self.tables.setdefault(query.table_name, [])
+
+            if query.action == "insert":
+                row = {"id": str(uuid.uuid4()), "created_at": _now(), **query.payload}
+                rows.append(row)
+                return _Result([copy.deepcopy(row)])
+
+            matched = [row for row in rows if all(f(row) for f in query.filters)]
+
+            if query.action == "update":
+                for row in matched:
+                    row.update(query.payload)
+                return _Result(copy.deepcopy(matched))
+
+            if query.order_by:
+                column, desc = query.order_by
+                matched = sorted(matched, key=lambda row: row.get(column) or "", reverse=desc)
+            if query.limit_n is not None:
+                matched = matched[:query.limit_n]
+            return _Result(copy.deepcopy(matched))
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+def seed(db: FakeSupabase, ready: int, completed: int) -> Dict[str, List[str]]:
+    """Create documents in the states the traffic mix needs"""
+    ids = {"ready": [], "completed": []}
+
+    for state, count in (("ready", ready), ("completed", completed)):
+        for _ in range(count):
+            doc_id = str(uuid.uuid4())
+            db.table("documents").insert({
+                "id": doc_id,
+                "filename": "lecture.pdf",
+                "file_size": 1024,
+                "status": state,
+                "total_pages": 40,
+                "total_chunks": 120,
+                "updated_at": _now()
+            }).execute()
+            db.table("job_status").insert({
+                "doc_id": doc_id,
+                "status": state,
+                "progress": 100,
+                "current_stage": "Seeded"
+            }).execute()
+            if state == "completed":
+                _insert_notes(db, doc_id)
+            ids[state].append(doc_id)
+
+    return ids
+
+def _insert_notes(db: FakeSupabase, doc_id: str):
+    db.table("notes").insert({
+        "doc_id": doc_id,
+        "title": "Lecture Notes",
+        "content": {
+            "title": "Lecture Notes",
+            "summary": "Load test notes.",
+            "keyTerms": [{"term": f"Term {i}", "definition": "Definition"} for i in range(8)],
+            "sections": [
+                {"heading": f"Section {i}", "introduction": "Intro", "subsections": [], "keyTerms": []}
+                for i in range(12)
+            ]
+        },
+        "generated_at": _now(),
+        "generation_time_seconds": 1
+    }).execute()
+
+class LagMonitor:
+    """Measures event-loop lag as the overshoot of short sleeps"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task = None
+
+    def start(self):
+        self.samples = []
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(time.perf_counter() - start - self.interval, 0.0))
+
+def detach_background_tasks(app):
+    """
+    Wrap an ASGI app so a request completes once its response body is
+    sent, as it does under uvicorn. httpx's ASGITransport otherwise waits
+    for background tasks too, which would count them as request latency.
+    """
+    pending = set()
+
+    async def wrapped(scope, receive, send):
+        if scope["type"] != "http":
+            return await app(scope, receive, send)
+
+        responded = asyncio.Event()
+
+        async def send_wrapper(message):
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body"):
+                responded.set()
+
+        task = asyncio.create_task(app(scope, receive, send_wrapper))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+
+        waiter = asyncio.create_task(responded.wait())
+        await asyncio.wait({task, waiter}, return_when=asyncio.FIRST_COMPLETED)
+        waiter.cancel()
+        if task.done():
+            task.result()
+
+    return wrapped
+
+def build_app(processing_seconds: float = 2.0, generation_seconds: float = 5.0, ready_docs: int = 200, completed_docs: int = 200):
+    """
+    Return (app, db, seeded_ids, lag_monitor) with all external services stubbed
+    """
+    for key, value in DUMMY_ENV.items():
+        os.environ.setdefault(key, value)
+    # Keep uploads and every derived cache out of the developer's real
+    # directories: uploads trigger storage-budget eviction over all of them
+    for key in ("UPLOAD_DIR", "CHECKPOINT_DIR", "PAGE_CACHE_DIR", "SECTION_CACHE_DIR"):
+        os.environ.setdefault(key, tempfile.mkdtemp(prefix=f"notesai-loadtest-{key.lower()}-"))
+
+    db = FakeSupabase()
+    database = types.ModuleType("app.core.database")
+    database.supabase = db
+    database.get_supabase = lambda: db
+    sys.modules["app.core.database"] = database
+
+    from app.main import app
+    from app.api.routes import upload, notes, retry
+    from app.core import jobs
+
+    async def process_pdf_pipeline(doc_id: str, pdf_path: str, claim_id: str):
+        await asyncio.sleep(processing_seconds)
+        if jobs.release(doc_id, claim_id, {"status": "ready", "total_pages": 40, "total_chunks": 120}):
+            db.table("job_status").update({"status": "ready", "progress": 100}).eq("doc_id", doc_id).execute()
+
+    async def generate_notes_pipeline(doc_id: str, claim_id: str, batch: bool = False):
+        await asyncio.sleep(generation_seconds)
+        if jobs.renew_lease(doc_id, claim_id):
+            _insert_notes(db, doc_id)
+        if jobs.release(doc_id, claim_id, {"status": "completed"}):
+            db.table("job_status").update({"status": "completed", "progress": 100}).eq("doc_id", doc_id).execute()
+
+    upload.process_pdf_pipeline = process_pdf_pipeline
+    retry.process_pdf_pipeline = process_pdf_pipeline
+    notes.generate_notes_pipeline = generate_notes_pipeline
+    retry.generate_notes_pipeline = generate_notes_pipeline
+
+    lag = LagMonitor()
+
+    # Lets a remote load generator read the server's event-loop lag
+    @app.post("/__loadtest/lag/reset", include_in_schema=False)
+    async def reset_lag():
+        lag.start()
+        return {"ok": True}
+
+    @app.get("/__loadtest/lag", include_in_schema=False)
+    async def get_lag():
+        return {"samples": lag.samples}
+
+    @app.get("/__loadtest/docs", include_in_schema=False)
+    async def get_docs():
+        return seeded
+
+    seeded = seed(db, ready_docs, completed_docs)
+
+    return app, db, seeded, lag
@@ -0,0 +1,33 @@
+"""
+Tests run without Supabase, Pinecone, OpenAI or Claude: settings get
+dummy values and temporary directories, and `app.core.database` is the
+in-memory Supabase from the load-test stubs.
+"""
+import os
+import sys
+import tempfile
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loadtest.stubs import DUMMY_ENV, FakeSupabase
+
+for key, value in DUMMY_ENV.items():
+    os.environ.setdefault(key, value)
+for key in ("UPLOAD_DIR", "CHECKPOINT_DIR", "PAGE_CACHE_DIR", "SECTION_CACHE_DIR"):
+    os.environ.setdefault(key, tempfile.mkdtemp(prefix=f"notesai-test-{key.lower()}-"))
+
+_db = FakeSupabase()
+_database = types.ModuleType("app.core.database")
+_database.supabase = _db
+_database.get_supabase = lambda: _db
+sys.modules["app.core.database"] = _database
+
+@pytest.fixture
+def db():
+    """The in-memory Supabase, emptied for each test"""
+    for rows in _db.tables.values():
+        rows.clear()
+    return _db
@@ -0,0 +1,62 @@
+"""
+In-memory stand-in for the parts of the Anthropic SDK that ClaudeClient
+uses: messages.create and messages.batches.
+"""
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Tuple
+import itertools
+
+def _message(text: str) -> SimpleNamespace:
+    return SimpleNamespace(content=[SimpleNamespace(type="text", text=text)])
+
+class FakeBatches:
+    """
+    Batches end after `polls` retrieve() calls. `outcome(params)` returns
+    (result type, text) per request, e.g. ("succeeded", "{...}") or
+    ("errored", None).
+    """
+
+    def __init__(self, outcome: Callable[[Dict], Tuple[str, str]], polls: int = 1):
+        self.outcome = outcome
+        self.polls = polls
+        self.created: List[Dict] = []
+        self.cancelled: List[str] = []
+        self._ids = itertools.count(1)
+        self._batches: Dict[str, Dict] = {}
+
+    def create(self, requests: List[Dict]) -> SimpleNamespace:
+        batch_id = f"msgbatch_{next(self._ids)}"
+        self._batches[batch_id] = {"requests": requests, "polls": 0}
+        self.created.append({"id": batch_id, "requests": requests})
+        return SimpleNamespace(id=batch_id, processing_status="in_progress")
+
+    def retrieve(self, batch_id: str) -> SimpleNamespace:
+        batch = self._batches[batch_id]
+        batch["polls"] += 1
+        status = "ended" if batch["polls"] >= self.polls else "in_progress"
+        return SimpleNamespace(id=batch_id, processing_status=status)
+
+    def cancel(self, batch_id: str):
+        self.cancelled.append(batch_id)
+
+    def results(self, batch_id: str):
+        for request in self._batches[batch_id]["requests"]:
+            result_type, text = self.outcome(request["params"])
+            result = SimpleNamespace(type=result_type)
+            if result_type == "succeeded":
+                result.message = _message(text)
+            yield SimpleNamespace(custom_id=request["custom_id"], result=result)
+
+class FakeMessages:
+    def __init__(self, respond: Callable[[Dict], str], batches: FakeBatches = None):
+        self.respond = respond
+        self.batches = batches
+        self.calls: List[Dict] = []
+
+    def create(self, **params) -> SimpleNamespace:
+        self.calls.append(params)
+        return _message(self.respond(params))
+
+class FakeAnthropic:
+    def __init__(self, respond: Callable[[Dict], str], batches: FakeBatches = None):
+        self.messages = FakeMessages(respond, batches)
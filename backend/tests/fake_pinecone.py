@@ -0,0 +1,38 @@
+"""
+In-memory stand-in for the Pinecone index methods PineconeClient uses:
+upsert, query (returning every vector of a namespace) and delete.
+"""
+from types import SimpleNamespace
+from typing import Callable, Dict, List
+import threading
+
+class FakeIndex:
+    """
+    Vectors kept per namespace. `fail_upsert(batch_number)` can raise to
+    simulate a failing upsert request (batches numbered from 1).
+    """
+
+    def __init__(self, fail_upsert: Callable[[int], None] = None):
+        self.namespaces: Dict[str, Dict[str, Dict]] = {}
+        self.upserts: List[List[str]] = []
+        self.fail_upsert = fail_upsert
+        self._lock = threading.Lock()
+
+    def upsert(self, vectors: List[Dict], namespace: str):
+        with self._lock:
+            if self.fail_upsert:
+                self.fail_upsert(len(self.upserts) + 1)
+            self.upserts.append([vector["id"] for vector in vectors])
+            stored = self.namespaces.setdefault(namespace, {})
+            for vector in vectors:
+                stored[vector["id"]] = vector
+
+    def query(self, namespace: str, **kwargs) -> SimpleNamespace:
+        vectors = self.namespaces.get(namespace, {}).values()
+        return SimpleNamespace(matches=[
+            SimpleNamespace(id=vector["id"], metadata=vector["metadata"])
+            for vector in vectors
+        ])
+
+    def delete(self, namespace: str, delete_all: bool = False):
+        self.namespaces.pop(namespace, None)
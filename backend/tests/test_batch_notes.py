@@ -0,0 +1,120 @@
+from types import SimpleNamespace
+import json
+
+import pytest
+
+from app.core.rag import RAGEngine
+from app.services.claude_client import ClaudeClient
+from app.services.checkpoints import CheckpointStore
+from app.services.pinecone_client import PineconeClient
+from app.services.section_store import SectionNotesStore
+from tests.fake_anthropic import FakeAnthropic, FakeBatches
+
+SECTIONS = ["Intro", "Methods", "Results"]
+
+class FakeIndex:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def query(self, **kwargs):
+        return SimpleNamespace(matches=[SimpleNamespace(metadata=chunk) for chunk in self.chunks])
+
+def _chunks():
+    return [
+        {"text": f"{name} content {i}", "page": n + 1, "heading": name, "heading_path": name, "chunk_index": n * 2 + i}
+        for n, name in enumerate(SECTIONS)
+        for i in range(2)
+    ]
+
+def _section(params) -> str:
+    return params["messages"][0]["content"].split("SECTION: ")[1].split("\n")[0]
+
+def _notes(params) -> str:
+    return json.dumps({"heading": _section(params), "introduction": "Notes", "subsections": [], "keyTerms": []})
+
+def _engine(tmp_path, outcome, polls=1):
+    batches = FakeBatches(outcome, polls=polls)
+    client = FakeAnthropic(lambda params: "Summary.", batches)
+    engine = RAGEngine(
+        batch_mode=True,
+        batch_poll_interval=0,
+        section_store=SectionNotesStore(str(tmp_path / "sections")),
+        claude_client=ClaudeClient(client=client),
+        pinecone_client=PineconeClient(index=FakeIndex(_chunks()))
+    )
+    return engine, batches, client
+
+def test_batch_mode_generates_every_section_in_one_batch(tmp_path):
+    engine, batches, client = _engine(tmp_path, lambda params: ("succeeded", _notes(params)), polls=3)
+
+    notes = engine.generate_comprehensive_notes("doc")
+
+    assert [section["introduction"] for section in notes["sections"]] == ["Notes"] * 3
+    assert [section["heading"] for section in notes["sections"]] == SECTIONS
+    assert len(batches.created) == 1
+    assert [r["custom_id"] for r in batches.created[0]["requests"]] == ["section-0", "section-1", "section-2"]
+    # Only the summary goes through the per-call API
+    assert len(client.messages.calls) == 1
+
+def test_errored_and_expired_results_fall_back_and_are_retried(tmp_path):
+    def outcome(params):
+        return {"Intro": ("succeeded", _notes(params)), "Methods": ("errored", None)}.get(_section(params), ("expired", None))
+
+    engine, batches, _ = _engine(tmp_path, outcome)
+    checkpoint = CheckpointStore("doc", base_dir=str(tmp_path / "checkpoints"))
+
+    notes = engine.generate_comprehensive_notes("doc", checkpoint=checkpoint)
+
+    assert [section["introduction"] for section in notes["sections"]] == [
+        "Notes", "Error processing section", "Error processing section"
+    ]
+
+    # A second run resubmits only the sections that failed
+    batches.outcome = lambda params: ("succeeded", _notes(params))
+    notes = engine.generate_comprehensive_notes("doc", checkpoint=checkpoint)
+
+    assert [r["custom_id"] for r in batches.created[1]["requests"]] == ["section-1", "section-2"]
+    assert [section["introduction"] for section in notes["sections"]] == ["Notes"] * 3
+
+def test_resume_waits_for_submitted_batch(tmp_path):
+    engine, batches, _ = _engine(tmp_path, lambda params: ("succeeded", _notes(params)), polls=2)
+    checkpoint = CheckpointStore("doc", base_dir=str(tmp_path / "checkpoints"))
+    retrieve = batches.retrieve
+
+    def restarted(batch_id):
+        raise RuntimeError("worker restarted")
+
+    batches.retrieve = restarted
+    with pytest.raises(RuntimeError):
+        engine.generate_comprehensive_notes("doc", checkpoint=checkpoint)
+    assert checkpoint.load_batch()["id"] == "msgbatch_1"
+
+    batches.retrieve = retrieve
+    notes = engine.generate_comprehensive_notes("doc", checkpoint=checkpoint)
+
+    assert len(batches.created) == 1
+    assert [section["introduction"] for section in notes["sections"]] == ["Notes"] * 3
+    assert checkpoint.load_batch() is None
+
+def test_unparsable_result_falls_back(tmp_path):
+    engine, _, _ = _engine(tmp_path, lambda params: ("succeeded", "not json"))
+
+    notes = engine.generate_comprehensive_notes("doc")
+
+    assert {section["introduction"] for section in notes["sections"]} == {"Error processing section"}
+
+def test_batch_timeout_cancels_batch():
+    batches = FakeBatches(lambda params: ("succeeded", "{}"), polls=1000)
+    client = ClaudeClient(client=FakeAnthropic(lambda params: "", batches))
+
+    with pytest.raises(TimeoutError):
+        client.run_batch({"a": client.build_params("system", "user")}, poll_interval=0, timeout=0)
+
+    assert batches.cancelled == ["msgbatch_1"]
+
+def test_system_prompt_marked_for_caching():
+    client = ClaudeClient(client=FakeAnthropic(lambda params: ""))
+
+    params = client.build_params("system", "user", cache_system=True)
+
+    assert params["system"] == [{"type": "text", "text": "system", "cache_control": {"type": "ephemeral"}}]
@@ -0,0 +1,88 @@
+from array import array
+
+import fitz
+import pytest
+
+from app.core.config import get_settings
+from app.services import pinecone_client, processing_pipeline
+from app.services.checkpoints import CheckpointStore
+from app.services.pinecone_client import PineconeClient
+from tests.fake_pinecone import FakeIndex
+
+settings = get_settings()
+
+class FakeEmbeddingService:
+    def __init__(self):
+        self.embedded = []
+
+    def embed_batch_f32(self, texts):
+        self.embedded.extend(texts)
+        return [array("f", [float(len(text)), 1.0]) for text in texts]
+
+@pytest.fixture
+def services(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "checkpoint_dir", str(tmp_path / "checkpoints"))
+    monkeypatch.setattr(settings, "page_cache_dir", str(tmp_path / "page_cache"))
+    embeddings, index = FakeEmbeddingService(), FakeIndex()
+    monkeypatch.setattr(processing_pipeline, "EmbeddingService", lambda: embeddings)
+    monkeypatch.setattr(processing_pipeline, "PineconeClient", lambda: PineconeClient(index=index))
+    return embeddings, index
+
+def _pdf(tmp_path, pages: int) -> str:
+    doc = fitz.open()
+    for n in range(pages):
+        page = doc.new_page()
+        page.insert_textbox(page.rect + (72, 72, -72, -72), f"Page {n + 1} words " * 300, fontsize=8)
+    path = tmp_path / "doc.pdf"
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+def test_ingest_stores_every_chunk(services, tmp_path):
+    embeddings, index = services
+
+    total_pages, total_chunks = processing_pipeline._ingest("doc", _pdf(tmp_path, 5))
+
+    stored = index.namespaces["doc"]
+    assert total_pages == 5
+    assert total_chunks == len(stored) == len(embeddings.embedded)
+    assert {vector["metadata"]["page"] for vector in stored.values()} == {1, 2, 3, 4, 5}
+    assert CheckpointStore("doc").is_ingested()
+
+def test_resume_after_failed_upsert_reuses_work(services, tmp_path, monkeypatch):
+    embeddings, index = services
+    monkeypatch.setattr(pinecone_client, "MAX_BATCH_VECTORS", 5)
+    monkeypatch.setattr(pinecone_client, "RETRY_BACKOFF_SECONDS", 0)
+    pdf = _pdf(tmp_path, 10)
+
+    def fail_third(batch_number):
+        if batch_number >= 3:
+            raise ConnectionError("upsert failed")
+
+    index.fail_upsert = fail_third
+    with pytest.raises(ConnectionError):
+        processing_pipeline._ingest("doc", pdf)
+    first_upserted = {vector_id for batch in index.upserts for vector_id in batch}
+    first_embedded = len(embeddings.embedded)
+
+    index.fail_upsert = None
+    index.upserts.clear()
+    total_pages, total_chunks = processing_pipeline._ingest("doc", pdf)
+    second_upserted = {vector_id for batch in index.upserts for vector_id in batch}
+
+    assert first_upserted and first_embedded
+    # Embeddings saved by the failed run are reused, not requested again
+    assert len(embeddings.embedded) == total_chunks
+    # Batches already stored are skipped
+    assert not first_upserted & second_upserted
+    assert len(index.namespaces["doc"]) == total_chunks > 10
+
+def test_append_drops_partial_last_line(tmp_path):
+    store = CheckpointStore("doc", base_dir=str(tmp_path))
+    store.mark_upserted(["chunk_1"])
+    with open(store.root / "upserted.txt", "a", encoding="utf-8") as f:
+        f.write("chunk_")  # crash mid-append
+
+    store.mark_upserted(["chunk_2"])
+
+    assert store.load_upserted() == {"chunk_1", "chunk_2"}
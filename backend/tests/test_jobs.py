@@ -0,0 +1,140 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import asyncio
+import time
+import uuid
+
+from app.core import jobs
+from app.api.routes import notes as notes_route
+
+LEASE = 60
+
+def _document(db, status: str) -> str:
+    doc_id = str(uuid.uuid4())
+    db.table("documents").insert({
+        "id": doc_id,
+        "status": status,
+        "updated_at": datetime.now(timezone.utc).isoformat()
+    }).execute()
+    db.table("job_status").insert({"doc_id": doc_id, "status": status, "progress": 0}).execute()
+    return doc_id
+
+def _expire_lease(db, doc_id: str):
+    stale = (datetime.now(timezone.utc) - timedelta(seconds=LEASE + 1)).isoformat()
+    db.table("documents").update({"updated_at": stale}).eq("id", doc_id).execute()
+
+def _document_row(db, doc_id: str) -> dict:
+    return db.table("documents").select("*").eq("id", doc_id).execute().data[0]
+
+def test_only_one_claim_wins(db):
+    doc_id = _document(db, "ready")
+
+    first = jobs.claim_document(doc_id, "ready", "generating", lease_seconds=LEASE)
+    second = jobs.claim_document(doc_id, "ready", "generating", lease_seconds=LEASE)
+
+    assert first and second is None
+    assert _document_row(db, doc_id)["claim_id"] == first
+
+def test_takeover_after_lease_expires(db):
+    doc_id = _document(db, "ready")
+    old = jobs.claim_document(doc_id, "ready", "generating", lease_seconds=LEASE)
+    _expire_lease(db, doc_id)
+
+    new = jobs.claim_document(doc_id, "ready", "generating", lease_seconds=LEASE)
+
+    assert new and new != old
+    # The previous holder can neither keep the lease alive nor finish the job
+    assert not jobs.renew_lease(doc_id, old)
+    assert not jobs.release(doc_id, old, {"status": "completed"})
+    assert _document_row(db, doc_id)["status"] == "generating"
+
+    assert jobs.renew_lease(doc_id, new)
+    assert jobs.release(doc_id, new, {"status": "completed"})
+    row = _document_row(db, doc_id)
+    assert row["status"] == "completed" and row["claim_id"] is None
+
+def test_heartbeat_stops_after_takeover(db):
+    doc_id = _document(db, "ready")
+    old = jobs.claim_document(doc_id, "ready", "generating")
+    new = jobs.claim_stale(doc_id, "generating", "generating", lease_seconds=0)
+
+    async def job(doc_id: str, claim_id: str):
+        await asyncio.sleep(0.1)
+
+    before = _document_row(db, doc_id)["updated_at"]
+    asyncio.run(jobs.run_with_lease(doc_id, old, job, lease_seconds=0.03))
+
+    assert new
+    assert _document_row(db, doc_id)["updated_at"] == before
+
+def test_heartbeat_renews_own_lease(db):
+    doc_id = _document(db, "ready")
+    claim_id = jobs.claim_document(doc_id, "ready", "generating")
+    _expire_lease(db, doc_id)
+
+    async def job(doc_id: str, claim_id: str):
+        await asyncio.sleep(0.1)
+
+    asyncio.run(jobs.run_with_lease(doc_id, claim_id, job, lease_seconds=0.03))
+
+    assert jobs.claim_stale(doc_id, "generating", "generating", LEASE) is None
+
+def test_heartbeat_renews_while_default_pool_is_busy(db, monkeypatch):
+    doc_id = _document(db, "ready")
+    claim_id = jobs.claim_document(doc_id, "ready", "generating")
+    renewals = []
+    renew = jobs.renew_lease
+
+    def counting_renew(doc_id: str, claim_id: str) -> bool:
+        renewals.append(time.monotonic())
+        return renew(doc_id, claim_id)
+
+    monkeypatch.setattr(jobs, "renew_lease", counting_renew)
+
+    async def job(doc_id: str, claim_id: str):
+        # The long job holds the only thread of the default executor
+        await asyncio.to_thread(time.sleep, 0.5)
+
+    async def main():
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=1))
+        await jobs.run_with_lease(doc_id, claim_id, job, lease_seconds=0.15)
+
+    asyncio.run(main())
+
+    assert len(renewals) >= 5
+
+class _FakeRAG:
+    def generate_comprehensive_notes(self, doc_id, checkpoint=None):
+        return {"title": "Notes", "summary": "", "keyTerms": [], "sections": []}
+
+def test_only_current_holder_saves_notes(db, monkeypatch):
+    monkeypatch.setattr(notes_route, "RAGEngine", lambda **kwargs: _FakeRAG())
+    doc_id = _document(db, "ready")
+    old = jobs.claim_document(doc_id, "ready", "generating", lease_seconds=LEASE)
+    _expire_lease(db, doc_id)
+    new = jobs.claim_document(doc_id, "ready", "generating", lease_seconds=LEASE)
+
+    asyncio.run(notes_route.generate_notes_pipeline(doc_id, claim_id=old))
+
+    assert db.table("notes").select("*").eq("doc_id", doc_id).execute().data == []
+    assert _document_row(db, doc_id)["status"] == "generating"
+
+    asyncio.run(notes_route.generate_notes_pipeline(doc_id, claim_id=new))
+
+    assert len(db.table("notes").select("*").eq("doc_id", doc_id).execute().data) == 1
+    assert _document_row(db, doc_id)["status"] == "completed"
+
+def test_stale_holder_failure_does_not_fail_document(db, monkeypatch):
+    class _FailingRAG:
+        def generate_comprehensive_notes(self, doc_id, checkpoint=None):
+            raise RuntimeError("boom")
+
+    monkeypatch.setattr(notes_route, "RAGEngine", lambda **kwargs: _FailingRAG())
+    doc_id = _document(db, "ready")
+    old = jobs.claim_document(doc_id, "ready", "generating", lease_seconds=LEASE)
+    _expire_lease(db, doc_id)
+    jobs.claim_document(doc_id, "ready", "generating", lease_seconds=LEASE)
+
+    asyncio.run(notes_route.generate_notes_pipeline(doc_id, claim_id=old))
+
+    assert _document_row(db, doc_id)["status"] == "generating"
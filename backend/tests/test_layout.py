@@ -0,0 +1,138 @@
+import fitz
+
+from app.services.layout import LayoutProfile
+from app.services.page_cache import PageTextCache, _extract_layout
+from app.services.pdf_processor import PDFProcessor
+
+BODY = "Body text that explains the topic in plenty of words for the statistics."
+
+def _lecture(pages: int = 6) -> fitz.Document:
+    doc = fitz.open()
+    for n in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 30), "CS101 Lecture Notes", fontsize=8)
+        page.insert_text((72, 90), f"Chapter {n + 1}: Café & <Tags>", fontsize=20, fontname="hebo")
+        page.insert_text((72, 130), "Body text with résumé, x < y && y > z.", fontsize=10)
+        page.insert_text((72, 146), "Mixed ", fontsize=10)
+        page.insert_text((104, 146), "bold run", fontsize=10, fontname="hebo")
+        page.insert_text((300, 820), str(n + 1), fontsize=8)
+    return doc
+
+def _dict_lines(page):
+    data = page.get_text("dict", flags=fitz.TEXTFLAGS_TEXT)
+    return [
+        "".join(span["text"] for span in line["spans"]).strip()
+        for block in data["blocks"]
+        for line in block.get("lines", ())
+        if any(span["text"].strip() for span in line["spans"])
+    ]
+
+def test_layout_text_matches_mupdf_lines():
+    doc = _lecture(1)
+    page = doc[0]
+
+    text, hints = _extract_layout(page)
+
+    assert text.split("\n") == _dict_lines(page)
+    assert len(hints["lines"]) == len(text.split("\n"))
+
+def test_layout_styles_and_positions():
+    doc = _lecture(1)
+    text, hints = _extract_layout(doc[0])
+    styles = dict(zip(text.split("\n"), hints["lines"]))
+
+    assert styles["Chapter 1: Café & <Tags>"][:2] == [20.0, 1]
+    assert styles["Body text with résumé, x < y && y > z."][:2] == [10.0, 0]
+    header_top = styles["CS101 Lecture Notes"][2]
+    footer_bottom = styles["1"][3]
+    assert header_top < 0.08 and footer_bottom > 0.92
+
+def test_profile_finds_headings_and_running_text():
+    doc = _lecture(6)
+    profile = LayoutProfile.from_pages(
+        (n + 1, *_extract_layout(page)) for n, page in enumerate(doc)
+    )
+
+    assert profile.body_size == 10.0
+    assert profile.heading_sizes == [20.0]
+    assert profile.heading_level("Chapter 1: Café & <Tags>", 20.0, 1) == 1
+    assert profile.heading_level("Body text", 10.0, 0) is None
+    assert profile.is_running_text("CS101 Lecture Notes", 8.0, 0, 0.03, 0.04)
+    assert profile.is_running_text("4", 8.0, 0, 0.96, 0.97)
+
+def _deck(tmp_path, pages) -> str:
+    """
+    Write a PDF from per-page lists of (text, font size, bold) lines,
+    laid out top-down from y=90; a line given as (text, size, bold, y)
+    is placed at y instead
+    """
+    doc = fitz.open()
+    for lines in pages:
+        page = doc.new_page()
+        y = 90
+        for line in lines:
+            text, size, bold = line[:3]
+            if len(line) > 3:
+                y = line[3]
+            page.insert_text((72, y), text, fontsize=size, fontname="hebo" if bold else "helv")
+            y += size * 1.6
+    path = tmp_path / "deck.pdf"
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+def _layout_chunks(tmp_path, pages):
+    processor = PDFProcessor(page_cache=PageTextCache(str(tmp_path / "cache")), layout_mode=True)
+    return list(processor.iter_chunks(_deck(tmp_path, pages)))
+
+def test_numbered_titles_in_top_margin_are_headings(tmp_path):
+    pages = [
+        [(f"Section {n + 1}: Topic", 20, True, 60), (BODY, 10, False, 120), (BODY, 10, False), ("Course 101", 8, False, 830)]
+        for n in range(12)
+    ]
+
+    chunks = _layout_chunks(tmp_path, pages)
+
+    assert [chunk.heading for chunk in chunks] == [f"Section {n + 1}: Topic" for n in range(12)]
+    assert all("Course 101" not in chunk.text for chunk in chunks)
+
+def test_heading_stack_carries_across_pages(tmp_path):
+    pages = [
+        [("Chapter One", 24, True), ("Intro", 16, True), (BODY, 10, False), (BODY, 10, False)],
+        [(BODY, 10, False), (BODY, 10, False)],
+        [("Background", 16, True), (BODY, 10, False), (BODY, 10, False)],
+        [("Chapter Two", 24, True), (BODY, 10, False), (BODY, 10, False)],
+    ]
+
+    chunks = _layout_chunks(tmp_path, pages)
+
+    assert [(chunk.page, chunk.heading) for chunk in chunks] == [
+        (1, "Chapter One > Intro"),
+        (2, "Chapter One > Intro"),
+        (3, "Chapter One > Background"),
+        (4, "Chapter Two"),
+    ]
+
+def test_wrapped_heading_is_joined(tmp_path):
+    pages = [
+        [("A Long Chapter Title That", 24, True), ("Wraps Onto Two Lines", 24, True), (BODY, 10, False), (BODY, 10, False)],
+    ]
+
+    chunks = _layout_chunks(tmp_path, pages)
+
+    assert [chunk.heading for chunk in chunks] == ["A Long Chapter Title That Wraps Onto Two Lines"]
+    assert chunks[0].text.startswith("A Long Chapter Title That Wraps Onto Two Lines Body")
+
+def test_heading_without_body_applies_to_next_page(tmp_path):
+    pages = [
+        [("Chapter One", 24, True), (BODY, 10, False), (BODY, 10, False), ("Methods", 16, True)],
+        [(BODY, 10, False), (BODY, 10, False)],
+    ]
+
+    chunks = _layout_chunks(tmp_path, pages)
+
+    assert [(chunk.page, chunk.heading) for chunk in chunks] == [
+        (1, "Chapter One"),
+        (2, "Chapter One > Methods"),
+    ]
+    assert "Methods" not in chunks[0].text
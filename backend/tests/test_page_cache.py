@@ -0,0 +1,133 @@
+from pathlib import Path
+import os
+
+import fitz
+import pytest
+
+from app.core.config import get_settings
+from app.services.page_cache import PageTextCache, enforce_storage_budget
+from app.services.section_store import SectionNotesStore
+
+settings = get_settings()
+
+@pytest.fixture
+def dirs(tmp_path, monkeypatch):
+    uploads, cache = tmp_path / "uploads", tmp_path / "page_cache"
+    uploads.mkdir()
+    monkeypatch.setattr(settings, "upload_dir", str(uploads))
+    monkeypatch.setattr(settings, "page_cache_dir", str(cache))
+    return uploads, cache
+
+def _pdf(path: Path, pages: int = 3, age: float = 0) -> Path:
+    doc = fitz.open()
+    for n in range(pages):
+        doc.new_page().insert_text((72, 72), f"Page {n + 1} text " * 20)
+    doc.save(str(path))
+    doc.close()
+    if age:
+        stamp = path.stat().st_mtime - age
+        os.utime(path, (stamp, stamp))
+    return path
+
+def test_artifact_survives_pdf_evicted_mid_build(dirs):
+    uploads, _ = dirs
+    pdf = _pdf(uploads / "doc.pdf")
+    cache = PageTextCache()
+
+    pages = cache.iter_pages(str(pdf))
+    first = next(pages)
+    pdf.unlink()
+    rest = list(pages)
+
+    assert [first[0]] + [page for page, _, _ in rest] == [1, 2, 3]
+    with cache.load(str(pdf)) as cached:
+        assert cached.total_pages == 3
+
+def test_pdf_without_artifact_is_never_evicted(dirs):
+    uploads, _ = dirs
+    pdf = _pdf(uploads / "failed.pdf", age=100)
+
+    enforce_storage_budget(budget_bytes=0)
+
+    assert pdf.exists()
+
+def test_pdf_with_build_in_progress_is_kept(dirs):
+    uploads, cache_dir = dirs
+    pdf = _pdf(uploads / "busy.pdf", age=100)
+    cache = PageTextCache()
+    list(cache.iter_pages(str(pdf)))
+    (cache_dir / "busy.layout.ptc.123.tmp").write_bytes(b"partial")
+
+    enforce_storage_budget(budget_bytes=0)
+
+    assert pdf.exists()
+
+def test_backed_up_pdfs_go_before_artifacts(dirs):
+    uploads, _ = dirs
+    cache = PageTextCache()
+    old = _pdf(uploads / "old.pdf", age=200)
+    new = _pdf(uploads / "new.pdf", age=100)
+    for pdf in (old, new):
+        list(cache.iter_pages(str(pdf)))
+    artifact_bytes = sum(cache.path_for(str(pdf)).stat().st_size for pdf in (old, new))
+
+    enforce_storage_budget(budget_bytes=artifact_bytes + new.stat().st_size)
+
+    assert not old.exists()
+    assert new.exists()
+    assert cache.path_for(str(old)).exists() and cache.path_for(str(new)).exists()
+
+    # Artifacts whose PDF is gone are the last copy, so they go last
+    enforce_storage_budget(budget_bytes=cache.path_for(str(new)).stat().st_size)
+
+    assert not new.exists()
+    assert not cache.path_for(str(old)).exists()
+    assert cache.path_for(str(new)).exists()
+
+def test_pdf_backed_up_only_in_other_mode_is_kept(dirs, monkeypatch):
+    uploads, _ = dirs
+    pdf = _pdf(uploads / "text-only.pdf", age=100)
+    list(PageTextCache().iter_pages(str(pdf), mode="text"))
+    monkeypatch.setattr(settings, "layout_extraction", True)
+
+    enforce_storage_budget(budget_bytes=0)
+
+    assert pdf.exists()
+
+def test_section_notes_are_evicted_under_budget(dirs, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "section_cache_dir", str(tmp_path / "sections"))
+    store = SectionNotesStore()
+    store.put("aa11", {"heading": "Old"})
+    store.put("bb22", {"heading": "New"})
+    old = store._path("aa11")
+    stamp = old.stat().st_mtime - 100
+    os.utime(old, (stamp, stamp))
+
+    enforce_storage_budget(budget_bytes=store._path("bb22").stat().st_size)
+
+    assert store.get("aa11") is None
+    assert store.get("bb22") == {"heading": "New"}
+
+def _evicted_before_touch(path, *args, **kwargs):
+    os.unlink(path)
+    raise FileNotFoundError(path)
+
+def test_artifact_evicted_before_touch_still_loads(dirs, monkeypatch):
+    uploads, _ = dirs
+    pdf = _pdf(uploads / "doc.pdf")
+    cache = PageTextCache()
+    expected = list(cache.iter_pages(str(pdf)))
+
+    monkeypatch.setattr(os, "utime", _evicted_before_touch)
+    pages = cache.load(str(pdf))
+
+    with pages:
+        assert list(pages.iter_pages()) == expected
+
+def test_section_notes_evicted_before_touch_still_returned(tmp_path, monkeypatch):
+    store = SectionNotesStore(str(tmp_path / "sections"))
+    store.put("aa11", {"heading": "Intro"})
+
+    monkeypatch.setattr(os, "utime", _evicted_before_touch)
+
+    assert store.get("aa11") == {"heading": "Intro"}
@@ -0,0 +1,40 @@
+from array import array
+import json
+import random
+
+from app.services.pinecone_client import PineconeClient, MAX_BATCH_VECTORS
+
+PINECONE_REQUEST_LIMIT = 2 * 1024 * 1024
+
+def _chunks(count: int, dimension: int = 1536):
+    rng = random.Random(0)
+    for i in range(count):
+        yield {
+            "chunk_id": f"chunk_{i}",
+            "text": "é" * 1200,
+            "page": i // 5 + 1,
+            "heading": "Heading",
+            "heading_path": "Part > Heading",
+            "chunk_index": i,
+            "embedding": array("f", (rng.uniform(-0.1, 0.1) for _ in range(dimension)))
+        }
+
+def _client() -> PineconeClient:
+    # Batching doesn't touch the index
+    return PineconeClient(index=object())
+
+def test_batches_fit_request_limit():
+    batches = list(_client()._iter_batches("doc", _chunks(300)))
+
+    assert len(batches) > 1
+    for batch, chunk_ids in batches:
+        body = json.dumps({"vectors": batch, "namespace": "doc"})
+        assert len(body) < PINECONE_REQUEST_LIMIT
+        assert len(batch) == len(chunk_ids) <= MAX_BATCH_VECTORS
+
+def test_batches_keep_every_chunk_in_order():
+    batches = list(_client()._iter_batches("doc", _chunks(120)))
+
+    chunk_ids = [chunk_id for _, ids in batches for chunk_id in ids]
+    assert chunk_ids == [f"chunk_{i}" for i in range(120)]
+    assert batches[0][0][0]["id"] == "doc_chunk_0"
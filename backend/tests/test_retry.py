@@ -0,0 +1,142 @@
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import asyncio
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core import jobs
+from app.core.config import get_settings
+from app.api.routes import notes, retry, upload
+
+settings = get_settings()
+
+@pytest.fixture
+def client(db, monkeypatch):
+    started, batch_flags = [], []
+
+    async def process_pdf_pipeline(doc_id: str, pdf_path: str, claim_id: str):
+        started.append(("process", doc_id))
+
+    async def generate_notes_pipeline(doc_id: str, claim_id: str, batch: bool = False):
+        started.append(("generate", doc_id))
+        batch_flags.append(batch)
+
+    monkeypatch.setattr(upload, "process_pdf_pipeline", process_pdf_pipeline)
+    monkeypatch.setattr(retry, "process_pdf_pipeline", process_pdf_pipeline)
+    monkeypatch.setattr(retry, "generate_notes_pipeline", generate_notes_pipeline)
+    monkeypatch.setattr(notes, "generate_notes_pipeline", generate_notes_pipeline)
+
+    from app.main import app
+    test_client = TestClient(app)
+    test_client.started = started
+    test_client.batch_flags = batch_flags
+    return test_client
+
+def _document(db, status: str, age_seconds: float = 0, **fields) -> str:
+    doc_id = str(uuid.uuid4())
+    updated_at = datetime.now(timezone.utc) - timedelta(seconds=age_seconds)
+    db.table("documents").insert({
+        "id": doc_id,
+        "filename": "lecture.pdf",
+        "status": status,
+        "updated_at": updated_at.isoformat(),
+        **fields
+    }).execute()
+    db.table("job_status").insert({"doc_id": doc_id, "status": status, "progress": 0}).execute()
+    Path(settings.upload_dir, f"{doc_id}.pdf").write_bytes(b"%PDF-1.4\n")
+    return doc_id
+
+def _status(db, doc_id: str) -> str:
+    return db.table("documents").select("status").eq("id", doc_id).execute().data[0]["status"]
+
+def test_upload_claims_processing(client, db):
+    response = client.post("/api/upload", files={"file": ("lecture.pdf", b"%PDF-1.4\n", "application/pdf")})
+
+    doc_id = response.json()["doc_id"]
+    assert _status(db, doc_id) == "processing"
+    assert client.started == [("process", doc_id)]
+    assert not jobs.is_running(doc_id)
+
+def test_upload_enforces_budget_off_event_loop(client, monkeypatch):
+    calls = []
+
+    def enforce_storage_budget(protect=()):
+        try:
+            asyncio.get_running_loop()
+            calls.append("event loop")
+        except RuntimeError:
+            calls.append("worker thread")
+
+    monkeypatch.setattr(upload, "enforce_storage_budget", enforce_storage_budget)
+
+    client.post("/api/upload", files={"file": ("lecture.pdf", b"%PDF-1.4\n", "application/pdf")})
+
+    assert calls == ["worker thread"]
+
+def test_retry_failed_document(client, db):
+    doc_id = _document(db, "failed")
+
+    response = client.post(f"/api/retry/{doc_id}")
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "processing"
+    assert client.started == [("process", doc_id)]
+
+@pytest.mark.parametrize("status", ["uploaded", "processing", "generating"])
+def test_retry_takes_over_expired_lease(client, db, status):
+    doc_id = _document(db, status, age_seconds=settings.generation_lease_seconds + 60)
+
+    response = client.post(f"/api/retry/{doc_id}")
+
+    assert response.status_code == 200
+    assert _status(db, doc_id) == "processing"
+
+def test_retry_resumes_generation_after_ingest(client, db):
+    doc_id = _document(db, "generating", age_seconds=settings.generation_lease_seconds + 60, total_chunks=12)
+
+    response = client.post(f"/api/retry/{doc_id}")
+
+    assert response.json()["status"] == "generating"
+    assert client.started == [("generate", doc_id)]
+
+@pytest.mark.parametrize("status", ["processing", "generating"])
+def test_retry_rejects_live_lease(client, db, status):
+    doc_id = _document(db, status, age_seconds=5)
+
+    response = client.post(f"/api/retry/{doc_id}")
+
+    assert response.status_code == 400
+    assert _status(db, doc_id) == status
+    assert client.started == []
+
+def test_retry_rejects_finished_document(client, db):
+    doc_id = _document(db, "completed", age_seconds=settings.generation_lease_seconds + 60)
+
+    assert client.post(f"/api/retry/{doc_id}").status_code == 400
+
+def test_retry_needs_artifact_of_current_mode(client, db, monkeypatch):
+    from app.services.page_cache import PageTextCache
+
+    doc_id = _document(db, "failed")
+    pdf = Path(settings.upload_dir, f"{doc_id}.pdf")
+    pdf.unlink()
+    text_artifact = PageTextCache().path_for(str(pdf), "text")
+    text_artifact.parent.mkdir(parents=True, exist_ok=True)
+    text_artifact.write_bytes(b"")
+    monkeypatch.setattr(settings, "layout_extraction", True)
+
+    assert client.post(f"/api/retry/{doc_id}").status_code == 410
+
+    monkeypatch.setattr(settings, "layout_extraction", False)
+    assert client.post(f"/api/retry/{doc_id}").status_code == 200
+
+def test_generate_is_real_time_unless_batch_requested(client, db):
+    first, second = _document(db, "ready"), _document(db, "ready")
+
+    client.post(f"/api/notes/generate/{first}")
+    client.post(f"/api/notes/generate/{second}?batch=true")
+
+    assert client.started == [("generate", first), ("generate", second)]
+    assert client.batch_flags == [False, True]
@@ -0,0 +1,78 @@
+import json
+
+from app.core.rag import RAGEngine
+from app.services.claude_client import ClaudeClient
+from app.services.pinecone_client import PineconeClient
+from app.services.section_store import SectionNotesStore
+from tests.fake_anthropic import FakeAnthropic
+from tests.fake_pinecone import FakeIndex
+
+def _store_document(index: FakeIndex, doc_id: str, sections: dict):
+    vectors = [
+        {
+            "id": f"{doc_id}_page{n + 1}_chunk{i}",
+            "values": [0.0],
+            "metadata": {"text": text, "page": n + 1, "heading": name, "heading_path": name, "chunk_index": i}
+        }
+        for n, (name, texts) in enumerate(sections.items())
+        for i, text in enumerate(texts)
+    ]
+    index.upsert(vectors=vectors, namespace=doc_id)
+
+def _section(params) -> str:
+    return params["messages"][0]["content"].split("SECTION: ")[1].split("\n")[0]
+
+def _is_section_call(params) -> bool:
+    return "SECTION: " in params["messages"][0]["content"]
+
+def _respond(params) -> str:
+    if not _is_section_call(params):
+        return "Summary."
+    return json.dumps({"heading": _section(params), "introduction": "Notes", "subsections": [], "keyTerms": []})
+
+def _section_calls(client: FakeAnthropic):
+    return [_section(params) for params in client.messages.calls if _is_section_call(params)]
+
+def _engine(tmp_path, index: FakeIndex, client: FakeAnthropic) -> RAGEngine:
+    return RAGEngine(
+        section_store=SectionNotesStore(str(tmp_path / "sections")),
+        claude_client=ClaudeClient(client=client),
+        pinecone_client=PineconeClient(index=index)
+    )
+
+def test_unchanged_sections_reuse_notes_across_documents(tmp_path):
+    index = FakeIndex()
+    client = FakeAnthropic(_respond)
+    engine = _engine(tmp_path, index, client)
+    original = {
+        "Intro": ["Welcome to the course."],
+        "Methods": ["We measure things.", "Carefully."],
+        "Results": ["It worked."],
+    }
+    revised = dict(original, Methods=["We measure things.", "Very carefully."])
+    _store_document(index, "v1", original)
+    _store_document(index, "v2", revised)
+
+    engine.generate_comprehensive_notes("v1")
+    first_run = _section_calls(client)
+    client.messages.calls.clear()
+
+    notes = engine.generate_comprehensive_notes("v2")
+    second_run = _section_calls(client)
+
+    assert first_run == ["Intro", "Methods", "Results"]
+    assert second_run == ["Methods"]
+    assert [section["heading"] for section in notes["sections"]] == ["Intro", "Methods", "Results"]
+
+def test_renamed_section_is_regenerated(tmp_path):
+    index = FakeIndex()
+    client = FakeAnthropic(_respond)
+    engine = _engine(tmp_path, index, client)
+    _store_document(index, "v1", {"Intro": ["Same content."]})
+    _store_document(index, "v2", {"Overview": ["Same content."]})
+
+    engine.generate_comprehensive_notes("v1")
+    notes = engine.generate_comprehensive_notes("v2")
+
+    assert _section_calls(client) == ["Intro", "Overview"]
+    assert notes["sections"][0]["heading"] == "Overview"
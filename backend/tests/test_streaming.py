@@ -0,0 +1,68 @@
+import threading
+import time
+
+import pytest
+
+from app.services.streaming import Pipe, PipelineCancelled, run_stage
+
+def _wait_for(thread: threading.Thread, timeout: float = 2.0):
+    thread.join(timeout)
+    assert not thread.is_alive(), f"{thread.name} did not exit"
+
+def test_items_flow_through_stages():
+    first, second = Pipe(4), Pipe(4)
+    stages = [
+        run_stage(range(100), first, "produce"),
+        run_stage((n * 2 for n in first), second, "double"),
+    ]
+
+    assert list(second) == [n * 2 for n in range(100)]
+    for stage in stages:
+        _wait_for(stage)
+
+def test_stage_error_reaches_consumer():
+    def failing():
+        yield 1
+        raise ValueError("boom")
+
+    pipe = Pipe(4)
+    stage = run_stage(failing(), pipe, "failing")
+
+    with pytest.raises(ValueError, match="boom"):
+        list(pipe)
+    _wait_for(stage)
+
+def test_cancel_unblocks_stage_waiting_on_input():
+    # The producer never finishes, so the middle stage sits in an empty pipe
+    release = threading.Event()
+
+    def stalled():
+        release.wait(5)
+        yield from ()
+
+    inputs, outputs = Pipe(4), Pipe(4)
+    producer = run_stage(stalled(), inputs, "stalled")
+    middle = run_stage(iter(inputs), outputs, "middle")
+
+    time.sleep(0.2)
+    inputs.cancel()
+    outputs.cancel()
+
+    _wait_for(middle)
+    release.set()
+    _wait_for(producer)
+
+def test_cancel_unblocks_producer_on_full_pipe():
+    pipe = Pipe(1)
+    stage = run_stage(iter(range(10)), pipe, "full")
+
+    time.sleep(0.2)
+    pipe.cancel()
+    _wait_for(stage)
+
+def test_cancelled_pipe_raises_for_consumer():
+    pipe = Pipe(1)
+    pipe.cancel()
+
+    with pytest.raises(PipelineCancelled):
+        next(iter(pipe))